@@ -4,7 +4,9 @@ Creativity Rating App - Streamlit Version
 Main application file with navigation and session state management.
 """
 import os
-import sys
+import logging
+import logging.handlers
+import queue
 
 # CRITICAL: Prevent segfaults on Streamlit Cloud
 os.environ['OPENBLAS_NUM_THREADS'] = '1'
@@ -14,8 +16,6 @@ os.environ['OMP_NUM_THREADS'] = '1'
 os.environ['ARROW_PRE_0_15_IPC_FORMAT'] = '1'
 
 import streamlit as st
-# Add utils to path
-sys.path.append(os.path.join(os.path.dirname(__file__), 'utils'))
 
 from utils.user import User
 from utils.config_loader import load_config
@@ -43,6 +43,27 @@ st.markdown(
     unsafe_allow_html=True
 )
 
+@st.cache_resource
+def init_logging():
+    """
+    Route log records from the utils modules through a background listener (once per process).
+
+    Callers only put records on a queue; a listener thread formats them and writes to
+    the console, so request handlers never wait on terminal output.
+    """
+    log_queue = queue.Queue()
+    console_handler = logging.StreamHandler()
+    console_handler.setFormatter(logging.Formatter('[%(levelname)s] %(message)s'))
+
+    listener = logging.handlers.QueueListener(log_queue, console_handler)
+    listener.start()
+
+    utils_logger = logging.getLogger('utils')
+    utils_logger.setLevel(logging.INFO)
+    utils_logger.addHandler(logging.handlers.QueueHandler(log_queue))
+    utils_logger.propagate = False
+    return listener
+
 # Initialize session state
 def init_session_state():
     """Initialize session state variables if not already set."""
@@ -69,6 +90,7 @@ def navigate_to(page_name):
     st.rerun()
 
 # Initialize
+init_logging()
 init_session_state()
 
 # Display current page based on session state
@@ -7,11 +7,10 @@ import streamlit as st
 import streamlit.components.v1 as components
 import os
 import pandas as pd
-import base64
 
 from utils.config_loader import load_rating_scales
 from utils.video_rating_display import display_video_rating_interface
-from utils.gdrive_manager import get_all_video_filenames, get_video_path
+from utils.gdrive_manager import get_all_video_filenames, get_video_path, encode_video_base64
 
 def display_video_with_mode(video_file_path, playback_mode='loop', video_width=None, enable_auto_advance=False):
     """
@@ -38,9 +37,7 @@ def display_video_with_mode(video_file_path, playback_mode='loop', video_width=N
             st.video(video_file_path, autoplay=True, loop=True)
 
     elif playback_mode == 'once':
-        with open(video_file_path, 'rb') as f:
-            video_bytes = f.read()
-        video_base64 = base64.b64encode(video_bytes).decode()
+        video_base64 = encode_video_base64(video_file_path)
 
         if video_width:
             if isinstance(video_width, str) and '%' in video_width:
@@ -109,18 +106,15 @@ def _validate_familiarization_ratings(scale_values):
 
     # Check group requirements
     group_requirements = st.session_state.get('group_requirements', {})
-    rating_scales = st.session_state.get('rating_scales', [])
+    group_to_scales = st.session_state.get('group_to_scales', {})
 
     for group_id, group_info in group_requirements.items():
         required_count = group_info['number_of_ratings']
         error_msg = group_info.get('error_msg', '')
         group_title = group_info.get('title', group_id)
 
-        # Find all scales in this group
-        group_scales = [
-            scale for scale in rating_scales
-            if scale.get('group') == group_id
-        ]
+        # All scales in this group (indexed once when the rating scales were loaded)
+        group_scales = group_to_scales.get(group_id, [])
 
         # Count how many scales in this group have been changed
         changed_count = 0
@@ -134,20 +128,8 @@ def _validate_familiarization_ratings(scale_values):
 
             # For sliders, check if value has been changed from initial position
             if scale.get('type') == 'slider':
-                initial_state = scale.get('initial_state', 'low')
-                slider_min = scale.get('slider_min', 0)
-                slider_max = scale.get('slider_max', 100)
-
-                # Calculate initial value based on initial_state
-                if initial_state == 'low':
-                    initial_value = slider_min
-                elif initial_state == 'high':
-                    initial_value = slider_max
-                else:  # center
-                    initial_value = (slider_min + slider_max) / 2
-
                 # Count as changed if value is different from initial
-                if value != initial_value:
+                if value != scale['initial_value']:
                     changed_count += 1
             else:
                 # For discrete and text types, any non-empty value counts as changed
@@ -239,12 +221,10 @@ def initialize_familiarization(config):
     st.session_state.rating_scales = rating_data['scales']
     st.session_state.rating_groups = rating_data['groups']
     st.session_state.group_requirements = rating_data['group_requirements']
+    st.session_state.group_to_scales = rating_data['group_to_scales']
 
     # Track which scales are required individually (not in a group)
-    st.session_state.required_scales = [
-        scale.get('title') for scale in st.session_state.rating_scales
-        if scale.get('required_to_proceed', True) and not scale.get('group')
-    ]
+    st.session_state.required_scales = rating_data['required_scales']
 
     # Get videos from local filesystem
     familiarization_path = config['paths'].get('familiarization_video_path', 'videos_familiarization')
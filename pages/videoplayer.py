@@ -6,17 +6,164 @@ import streamlit as st
 import streamlit.components.v1 as components
 import os
 import pandas as pd
-import random
-import base64
-from io import BytesIO
+import numpy as np
 
 from utils.config_loader import load_rating_scales
-from utils.data_persistence import save_rating, get_rated_videos_for_user
-from utils.video_rating_display import display_video_rating_interface
-from utils.gdrive_manager import get_all_video_filenames, get_video_path
+from utils.data_persistence import save_rating, get_rated_videos_for_user, count_ratings_per_video
+from utils.video_rating_display import display_video_rating_interface, get_scale_values_from_state
+from utils.gdrive_manager import get_all_video_filenames, get_video_path, encode_video_base64
 from utils.device_detection import get_device_info_cached
 
-def stratified_sample_videos(videos_to_rate, df_metadata, number_of_videos, strat_config):
+PITCH_COLUMNS = ['start_x', 'start_y', 'end_x', 'end_y']
+
+
+@st.cache_data(show_spinner=False)
+def _load_metadata(path, mtime, columns=None, categorical_levels=()):
+    """
+    Load event metadata from a DuckDB or CSV file.
+
+    Cached once per server process (shared across sessions) and keyed on the
+    file's modification time, so the file is only parsed again after it changes.
+
+    Args:
+        path: Path to the metadata file (.duckdb or .csv)
+        mtime: Modification time of the file (only used as part of the cache key)
+        columns: Optional tuple of column names to load (None = all columns)
+        categorical_levels: Tuple of (column, levels) pairs; each column is converted to a pandas
+            Categorical whose first categories are the configured levels, in order
+
+    Returns:
+        DataFrame with metadata indexed by 'id' (empty if the file type is not supported)
+    """
+    if path.endswith('.duckdb'):
+        # Load from DuckDB. The import stays lazy to avoid binary conflicts on Streamlit Cloud;
+        # it only runs on a cache miss, not on every session or rerun.
+        try:
+            import duckdb
+        except ImportError:
+            raise RuntimeError("duckdb is required to load .duckdb metadata files")
+        conn = duckdb.connect(path, read_only=True)
+        df = conn.execute("SELECT * FROM events").fetchdf()
+        conn.close()
+        if columns is not None:
+            df = df[[col for col in df.columns if col in columns]]
+    elif path.endswith('.csv'):
+        # The pyarrow engine parses with multiple threads, but only accepts usecols as a
+        # list of existing names, so read the header first to drop unknown columns
+        usecols = None
+        if columns is not None:
+            header = pd.read_csv(path, nrows=0).columns
+            usecols = [col for col in header if col in columns]
+        df = pd.read_csv(path, engine='pyarrow', dtype_backend='pyarrow',
+                         usecols=usecols, dtype={'id': 'string[pyarrow]'})
+    else:
+        print(f"[WARNING] Unsupported metadata file type: {path}")
+        return pd.DataFrame()
+
+    # Stratification variables are compared level by level on their integer category codes.
+    # Values outside the configured levels are kept as extra categories after them.
+    for col, levels in categorical_levels:
+        if col in df.columns:
+            categories = list(dict.fromkeys(levels))
+            known = set(categories)
+            categories += [value for value in pd.unique(df[col].dropna()) if value not in known]
+            df[col] = pd.Categorical(df[col], categories=categories)
+
+    # Index by id (keeping the column) so filtering by video IDs is a hash lookup
+    if 'id' in df.columns:
+        df = df.set_index('id', drop=False).rename_axis(None)
+
+    return df
+
+
+@st.cache_data(show_spinner=False)
+def _list_videos(video_path, dir_mtime):
+    """
+    List the .mp4 files in a video directory.
+
+    Cached once per server process and keyed on the directory's modification time,
+    which changes whenever a file is added to or removed from it.
+
+    Args:
+        video_path: Directory containing the video files
+        dir_mtime: Modification time of the directory (only used as part of the cache key)
+
+    Returns:
+        Tuple of (video filenames, video IDs without the .mp4 extension)
+    """
+    with os.scandir(video_path) as entries:
+        videos = [entry.name for entry in entries if entry.name.lower().endswith('.mp4')]
+
+    return videos, [v[:-4] for v in videos]
+
+
+def _metadata_columns(config, strat_config):
+    """
+    Determine which metadata columns are read by the app.
+
+    Covers stratification, the completion screen (WinLoss) and, if enabled,
+    the metadata bar and pitch visualization.
+
+    Returns:
+        Sorted tuple of column names
+    """
+    settings = config['settings']
+    columns = {'id', 'WinLoss'}
+    columns.update(var_config.get('variable') for var_config in strat_config if var_config.get('variable'))
+
+    if settings.get('display_metadata', True):
+        columns.update(field.get('column') for field in settings.get('metadata_to_show', []) if field.get('column'))
+
+    if settings.get('display_pitch', True):
+        columns.update(PITCH_COLUMNS)
+
+    return tuple(sorted(columns))
+
+
+def _validate_strat_config(strat_config, df_columns):
+    """
+    Validate the stratification configuration once, before any sampling.
+
+    Entries with missing fields, mismatched levels/proportions or a variable that is
+    not in the metadata are skipped with a warning, so sampling itself needs no checks.
+
+    Args:
+        strat_config: List of stratification configs from config.yaml
+        df_columns: Columns of the loaded metadata
+
+    Returns:
+        List of valid configs with 'variable', 'levels' and 'proportions' (numpy array)
+    """
+    validated = []
+
+    for var_config in strat_config or []:
+        variable = var_config.get('variable')
+        levels_list = var_config.get('levels', [])
+        proportions = var_config.get('proportions', [])
+
+        if not variable or not levels_list or not proportions:
+            print(f"[WARNING] Invalid stratification config: {var_config}. Skipping stratification by this variable.")
+            continue
+
+        if len(levels_list) != len(proportions):
+            print(f"[WARNING] Levels and proportions length mismatch for '{variable}'. Skipping stratification by this variable.")
+            continue
+
+        if variable not in df_columns:
+            print(f"[WARNING] Variable '{variable}' not found in metadata. Skipping stratification.")
+            continue
+
+        proportions = np.asarray(proportions, dtype=float)
+        if abs(proportions.sum() - 1.0) > 0.01:
+            print(f"[WARNING] Proportions for '{variable}' don't sum to 1.0: {proportions.sum()}")
+
+        validated.append({'variable': variable, 'levels': list(levels_list), 'proportions': proportions})
+
+    return validated
+
+
+def stratified_sample_videos(videos_to_rate, df_metadata, number_of_videos, strat_config, rng=None,
+                             event_ids=None):
     """
     Perform hierarchical stratified sampling of videos based on metadata variables.
 
@@ -25,28 +172,33 @@ def stratified_sample_videos(videos_to_rate, df_metadata, number_of_videos, stra
 
     Args:
         videos_to_rate: List of video filenames (e.g., ['event_001.mp4', ...])
-        df_metadata: DataFrame with metadata including 'id' column matching video IDs
+        df_metadata: DataFrame with metadata including 'id' column matching video IDs, indexed by 'id'
         number_of_videos: Target number of videos to select (None = all available)
-        strat_config: List of stratification configs, each with 'variable', 'levels', 'proportions'
+        strat_config: List of validated stratification configs (see _validate_strat_config)
+        rng: numpy random Generator (default: a freshly seeded one)
+        event_ids: Optional precomputed frozenset of video IDs (filenames without '.mp4')
 
     Returns:
         List of selected video filenames (shuffled)
     """
+    if rng is None:
+        rng = np.random.default_rng()
+
     # If no stratification config or empty, use simple random sampling
     if not strat_config or len(strat_config) == 0:
         if number_of_videos and number_of_videos < len(videos_to_rate):
-            selected = random.sample(videos_to_rate, number_of_videos)
-            random.shuffle(selected)
-            return selected
+            # choice() without replacement already returns the sample in random order
+            return rng.choice(videos_to_rate, size=number_of_videos, replace=False).tolist()
         else:
-            random.shuffle(videos_to_rate)
+            rng.shuffle(videos_to_rate)
             return videos_to_rate
 
-    # Get event IDs from video filenames
-    event_ids = [v.replace('.mp4', '') for v in videos_to_rate]
+    # Get event IDs from video filenames (unless the caller already computed them)
+    if event_ids is None:
+        event_ids = frozenset(v[:-4] for v in videos_to_rate)
 
-    # Filter metadata to only available videos
-    df = df_metadata[df_metadata['id'].isin(event_ids)].copy()
+    # Filter metadata to only available videos (read-only below, so no copy needed)
+    df = df_metadata.loc[df_metadata.index.intersection(list(event_ids))]
 
     if df.empty:
         print("[WARNING] No metadata found for available videos")
@@ -56,91 +208,153 @@ def stratified_sample_videos(videos_to_rate, df_metadata, number_of_videos, stra
     target = number_of_videos if number_of_videos else len(df)
     target = min(target, len(df))  # Cap at available
 
-    # Apply hierarchical stratification
-    selected_ids = _stratified_sample_recursive(df, strat_config, target, 0)
+    # Every available video is requested, so there is nothing to balance: just shuffle
+    if target >= len(videos_to_rate):
+        rng.shuffle(videos_to_rate)
+        return videos_to_rate
+
+    # Apply stratification (a single variable needs no recursion)
+    if len(strat_config) == 1:
+        selected_ids = _stratified_sample_single(df, strat_config[0], target, rng)
+    else:
+        selected_ids = _stratified_sample_recursive(df, strat_config, target, 0, rng)
 
     # Convert back to video filenames
     selected_videos = [vid_id + '.mp4' for vid_id in selected_ids]
 
     # Shuffle to randomize presentation order within strata
-    random.shuffle(selected_videos)
+    rng.shuffle(selected_videos)
 
     return selected_videos
 
 
-def _stratified_sample_recursive(df, strat_config, target_count, level):
+def _level_codes(column, levels_list):
+    """
+    Get the integer category codes of a stratification column and the code of each level.
+
+    Args:
+        column: Metadata column (Categorical when loaded through _load_metadata)
+        levels_list: Configured levels, in order
+
+    Returns:
+        Tuple (codes, level_codes) of numpy arrays; a level missing from the data has code -1
+    """
+    if not isinstance(column.dtype, pd.CategoricalDtype):
+        column = column.astype('category')
+    return column.cat.codes.to_numpy(), column.cat.categories.get_indexer(levels_list)
+
+
+def _stratified_sample_single(df, var_config, target_count, rng):
+    """
+    Stratify by a single variable without recursion.
+
+    Row positions per level come from comparing the integer category codes and each
+    level is sampled directly from those positions, so no per-level DataFrame is built.
+
+    Args:
+        df: DataFrame of available videos
+        var_config: Validated stratification config (see _validate_strat_config)
+        target_count: Number of videos to select
+        rng: numpy random Generator used for sampling
+
+    Returns:
+        List of selected video IDs
+    """
+    variable = var_config['variable']
+    levels_list = var_config['levels']
+    proportions = var_config['proportions']
+
+    codes, level_codes = _level_codes(df[variable], levels_list)
+    # A level missing from the data has code -1, which would otherwise match the NaN rows
+    positions = [np.flatnonzero(codes == code) if code >= 0 else np.empty(0, dtype=np.intp)
+                 for code in level_codes]
+    available = np.array([len(pos) for pos in positions])
+
+    if available.sum() == 0:
+        print(f"[WARNING] No videos found for '{variable}' with levels {levels_list}")
+        # Fallback: return from unfiltered
+        return df['id'].tolist()[:target_count]
+
+    requested = np.round(target_count * proportions).astype(int)
+    level_targets = np.minimum(requested, available)
+
+    selected_positions = []
+    for level_value, level_positions, level_target, n_requested, n_available in zip(
+            levels_list, positions, level_targets, requested, available):
+        if n_available == 0:
+            print(f"[INFO] No videos for {variable}={level_value}, skipping")
+            continue
+        if n_available < n_requested:
+            print(f"[INFO] {variable}={level_value}: requested {n_requested}, only {n_available} available. Taking all.")
+        selected_positions.append(rng.choice(level_positions, size=level_target, replace=False))
+
+    if not selected_positions:
+        return []
+
+    return df['id'].to_numpy()[np.concatenate(selected_positions)].tolist()
+
+
+def _stratified_sample_recursive(df, strat_config, target_count, level, rng):
     """
     Recursively apply stratification by each variable in hierarchy.
 
     Args:
         df: DataFrame of available videos at this level
-        strat_config: Full stratification configuration
+        strat_config: Full validated stratification configuration
         target_count: Number of videos to select at this level
         level: Current stratification level (0-indexed)
+        rng: numpy random Generator used for sampling
 
     Returns:
         List of selected video IDs
     """
     # Base case: no more stratification levels
     if level >= len(strat_config):
-        # Sample randomly from remaining videos
-        if target_count and target_count < len(df):
-            sampled = df.sample(n=target_count, replace=False)
-            return sampled['id'].tolist()
+        # Sample randomly from remaining videos (a target of None means all, 0 means none)
+        if target_count is not None and target_count < len(df):
+            sampled_positions = rng.choice(len(df), size=target_count, replace=False)
+            return df['id'].iloc[sampled_positions].tolist()
         else:
             return df['id'].tolist()
 
-    # Get current stratification variable configuration
+    # Get current stratification variable configuration (validated once at init)
     var_config = strat_config[level]
-    variable = var_config.get('variable')
-    levels_list = var_config.get('levels', [])
-    proportions = var_config.get('proportions', [])
-
-    # Validate configuration
-    if not variable or not levels_list or not proportions:
-        print(f"[WARNING] Invalid stratification config at level {level}: {var_config}")
-        return df['id'].tolist()[:target_count] if target_count else df['id'].tolist()
-
-    if len(levels_list) != len(proportions):
-        print(f"[WARNING] Levels and proportions length mismatch for '{variable}'")
-        return df['id'].tolist()[:target_count] if target_count else df['id'].tolist()
+    variable = var_config['variable']
+    levels_list = var_config['levels']
+    proportions = var_config['proportions']
 
-    if abs(sum(proportions) - 1.0) > 0.01:
-        print(f"[WARNING] Proportions for '{variable}' don't sum to 1.0: {sum(proportions)}")
+    # Compare integer category codes instead of level values
+    codes, level_codes = _level_codes(df[variable], levels_list)
 
-    # Check if variable exists in metadata
-    if variable not in df.columns:
-        print(f"[WARNING] Variable '{variable}' not found in metadata. Skipping stratification.")
-        return df['id'].tolist()[:target_count] if target_count else df['id'].tolist()
-
-    # Filter to only specified levels
-    df_filtered = df[df[variable].isin(levels_list)]
-
-    if len(df_filtered) == 0:
+    if not np.isin(codes, level_codes[level_codes >= 0]).any():
         print(f"[WARNING] No videos found for '{variable}' with levels {levels_list}")
         # Fallback: return from unfiltered
-        return df['id'].tolist()[:target_count] if target_count else df['id'].tolist()
+        return df['id'].tolist()[:target_count] if target_count is not None else df['id'].tolist()
 
     # Calculate target counts per level and sample
     selected_ids = []
 
-    for i, level_value in enumerate(levels_list):
-        level_df = df_filtered[df_filtered[variable] == level_value]
+    for i, (level_value, code) in enumerate(zip(levels_list, level_codes)):
+        level_df = df[codes == code] if code >= 0 else df.iloc[:0]
 
         if len(level_df) == 0:
             print(f"[INFO] No videos for {variable}={level_value}, skipping")
             continue
 
         # Calculate target count for this level based on proportion
-        level_target = int(round(target_count * proportions[i])) if target_count else None
+        level_target = int(round(target_count * proportions[i])) if target_count is not None else None
+
+        # A level whose share rounds to 0 gets no videos (as in _stratified_sample_single)
+        if level_target == 0:
+            continue
 
         # If too few videos available, take all
-        if level_target and len(level_df) < level_target:
+        if level_target is not None and len(level_df) < level_target:
             print(f"[INFO] {variable}={level_value}: requested {level_target}, only {len(level_df)} available. Taking all.")
             level_target = len(level_df)
 
         # Recursively stratify by next variable within this stratum
-        level_selected = _stratified_sample_recursive(level_df, strat_config, level_target, level + 1)
+        level_selected = _stratified_sample_recursive(level_df, strat_config, level_target, level + 1, rng)
         selected_ids.extend(level_selected)
 
     return selected_ids
@@ -170,9 +384,7 @@ def display_video_with_mode(video_file_path, playback_mode='loop', video_width=N
             st.video(video_file_path, autoplay=True, loop=True)
 
     elif playback_mode == 'once':
-        with open(video_file_path, 'rb') as f:
-            video_bytes = f.read()
-        video_base64 = base64.b64encode(video_bytes).decode()
+        video_base64 = encode_video_base64(video_file_path)
 
         if video_width:
             if isinstance(video_width, str) and '%' in video_width:
@@ -274,7 +486,7 @@ def show():
 def display_video_screen(action_id, video_filename, config):
     """Display only the video (centered, no ratings)."""
     video_path = st.session_state.video_path
-    metadata = st.session_state.metadata
+    metadata_by_id = st.session_state.get('metadata_by_id')
     rating_scales = st.session_state.rating_scales
 
     # Add custom CSS to eliminate vertical spacing
@@ -313,7 +525,7 @@ def display_video_screen(action_id, video_filename, config):
         rating_scales=rating_scales,
         key_prefix="scale_",
         action_id=action_id,
-        metadata=metadata,
+        metadata=metadata_by_id,
         header_content=None,
         display_video_func=display_video_with_mode,
         display_mode='video_only'
@@ -340,7 +552,7 @@ def display_rating_screen(action_id, video_filename, config):
     #    st.info(f"📊 **Rating {current_index} of {total_videos}**. Please rate the video you just watched.")
 
     # Use shared display function in rating-only mode
-    scale_values = display_video_rating_interface(
+    display_video_rating_interface(
         video_filename=video_filename,
         video_path=video_path,
         config=config,
@@ -362,40 +574,67 @@ def display_rating_screen(action_id, video_filename, config):
             st.rerun()
 
     with col3:
-        if st.button("Submit Rating ▶️", use_container_width=True, type="primary"):
-            # Validate ratings
-            validation_errors = _validate_ratings(scale_values)
-
-            if validation_errors:
-                st.error("⚠️ Please complete the required ratings:")
-                for error in validation_errors:
-                    st.warning(error)
-                st.stop()
-
-            # Save rating
-            if save_rating(user.user_id, action_id, scale_values):
-                st.success("✅ Rating saved successfully!")
-
-                # Track win/loss prediction for this session (for completion screen)
-                win_loss_prediction = scale_values.get('Win or Loss')
-                if win_loss_prediction is not None:
-                    if 'session_ratings' not in st.session_state:
-                        st.session_state.session_ratings = {}
-                    st.session_state.session_ratings[action_id] = win_loss_prediction
-
-                # Move to next video
-                st.session_state.current_video_index += 1
-                st.session_state.current_screen = 'video'  # Reset to video screen for next video
-                st.session_state.confirm_back = False
-
-                # Small delay to show success message
-                import time
-                time.sleep(0.5)
-
-                # Clear and move to next video
-                st.rerun()
-            else:
-                st.error("❌ Failed to save rating. Please try again.")
+        # Saving and advancing happen in the callback, before the rerun triggered by the click
+        st.button(
+            "Submit Rating ▶️",
+            use_container_width=True,
+            type="primary",
+            on_click=_submit_and_advance,
+            args=(action_id, video_filename)
+        )
+
+    _show_submit_feedback()
+
+
+def _submit_and_advance(action_id, video_filename):
+    """
+    Validate and save the current rating, then move on to the next video.
+
+    Used as the submit button's on_click callback: all state changes happen in one
+    go before the rerun caused by the click, so the next video is rendered by that
+    same rerun instead of a second st.rerun().
+    """
+    user = st.session_state.user
+    scale_values = get_scale_values_from_state(
+        video_filename, st.session_state.rating_scales, "scale_", action_id
+    )
+
+    # Validate ratings
+    validation_errors = _validate_ratings(scale_values)
+    if validation_errors:
+        st.session_state.rating_errors = validation_errors
+        return
+
+    # Save rating
+    if not save_rating(user.user_id, action_id, scale_values):
+        st.session_state.rating_save_failed = True
+        return
+
+    st.toast("✅ Rating saved successfully!")
+
+    # Track win/loss prediction for this session (for completion screen)
+    win_loss_prediction = scale_values.get('Win or Loss')
+    if win_loss_prediction is not None:
+        if 'session_ratings' not in st.session_state:
+            st.session_state.session_ratings = {}
+        st.session_state.session_ratings[action_id] = win_loss_prediction
+
+    # Move to next video
+    st.session_state.current_video_index += 1
+    st.session_state.current_screen = 'video'  # Reset to video screen for next video (separate mode)
+    st.session_state.confirm_back = False
+
+
+def _show_submit_feedback():
+    """Show validation or save errors recorded by the last submit attempt."""
+    validation_errors = st.session_state.pop('rating_errors', None)
+    if validation_errors:
+        st.error("⚠️ Please complete the required ratings:")
+        for error in validation_errors:
+            st.warning(error)
+
+    if st.session_state.pop('rating_save_failed', False):
+        st.error("❌ Failed to save rating. Please try again.")
 
 
 def initialize_video_player(config):
@@ -407,6 +646,12 @@ def initialize_video_player(config):
     if 'session_ratings' not in st.session_state:
         st.session_state.session_ratings = {}
 
+    # One random generator per session; the seed is kept so a session's sample can be reproduced
+    if 'rng' not in st.session_state:
+        st.session_state.rng_seed = np.random.SeedSequence().entropy
+        st.session_state.rng = np.random.default_rng(st.session_state.rng_seed)
+    rng = st.session_state.rng
+
     # Detect and cache device information (once per session)
     # This will be attached to each rating submitted
     device_info = get_device_info_cached()
@@ -416,12 +661,13 @@ def initialize_video_player(config):
     st.session_state.rating_scales = rating_data['scales']
     st.session_state.rating_groups = rating_data['groups']
     st.session_state.group_requirements = rating_data['group_requirements']
+    st.session_state.group_to_scales = rating_data['group_to_scales']
 
     # Track which scales are required individually (not in a group)
-    st.session_state.required_scales = [
-        scale.get('title') for scale in st.session_state.rating_scales
-        if scale.get('required_to_proceed', True) and not scale.get('group')
-    ]
+    st.session_state.required_scales = rating_data['required_scales']
+
+    # Column keys the ratings are saved under (used by save_rating)
+    st.session_state._scale_key_map = rating_data['scale_key_map']
 
     # Get configuration
     metadata_path = config['paths']['metadata_path']
@@ -430,63 +676,63 @@ def initialize_video_player(config):
 
     # Get all video files from local filesystem
     try:
-        all_videos = [f for f in os.listdir(video_path) if f.lower().endswith('.mp4')]
+        all_videos, all_video_ids = _list_videos(video_path, os.path.getmtime(video_path))
         st.session_state.video_path = video_path
         print(f"[INFO] Loaded {len(all_videos)} videos from {video_path}")
     except FileNotFoundError:
         st.error(f"Video directory not found: {video_path}")
-        all_videos = []
+        all_videos, all_video_ids = [], []
 
     # Filter out videos already rated by this user
     videos_rated_by_user = get_rated_videos_for_user(user.user_id)
-    unrated_videos = [v for v in all_videos if v.replace('.mp4', '') not in videos_rated_by_user]
+    unrated_videos = [v for v, vid in zip(all_videos, all_video_ids) if vid not in videos_rated_by_user]
 
     # Count total ratings per video and filter out fully-rated videos
     try:
-        rated_files = os.listdir('user_ratings')
-        rated_ids = [f.split('_')[1].replace('.json', '') for f in rated_files if f.endswith('.json')]
-        rating_counts = pd.Series(rated_ids).value_counts()
-        videos_fully_rated = rating_counts[rating_counts >= min_ratings_per_video].index.tolist()
-        videos_to_rate = [v for v in unrated_videos if v.replace('.mp4', '') not in videos_fully_rated]
+        rating_counts = count_ratings_per_video()
+        videos_fully_rated = {vid for vid, count in rating_counts.items() if count >= min_ratings_per_video}
+        videos_to_rate = [v for v in unrated_videos if v[:-4] not in videos_fully_rated]
     except Exception as e:
         print(f"[WARNING] Error filtering fully-rated videos: {e}")
         videos_to_rate = unrated_videos
 
+    # Get sampling configuration
+    number_of_videos = config['settings'].get('number_of_videos', None)
+    strat_config = config['settings'].get('variables_for_stratification', []) or []
+
+    # Video IDs available to rate, shared by the metadata filter and stratification
+    event_ids = frozenset(v[:-4] for v in videos_to_rate)
+
     # Load FULL metadata (keep all rows for completion screen)
     df_metadata_full = pd.DataFrame()
     df_metadata_filtered = pd.DataFrame()
     try:
-        # Detect file type and load metadata accordingly
-        if metadata_path.endswith('.duckdb'):
-            # Load from DuckDB (lazy import to avoid binary conflicts on Streamlit Cloud)
-            import duckdb
-            conn = duckdb.connect(metadata_path, read_only=True)
-            df_metadata_full = conn.execute("SELECT * FROM events").fetchdf()
-            conn.close()
-        elif metadata_path.endswith('.csv'):
-            # Load FULL CSV (don't filter yet - needed for completion screen)
-            df_metadata_full = pd.read_csv(metadata_path)
-        else:
-            print(f"[WARNING] Unsupported metadata file type: {metadata_path}")
-            df_metadata_full = pd.DataFrame()
+        df_metadata_full = _load_metadata(
+            metadata_path,
+            os.path.getmtime(metadata_path),
+            columns=_metadata_columns(config, strat_config),
+            categorical_levels=tuple(
+                (var_config.get('variable'), tuple(var_config.get('levels') or ()))
+                for var_config in strat_config if var_config.get('variable')
+            )
+        )
 
         # Create filtered version for stratification (only videos available to rate)
         if videos_to_rate and not df_metadata_full.empty:
-            event_ids = [v.replace('.mp4', '') for v in videos_to_rate]
-            df_metadata_filtered = df_metadata_full[df_metadata_full['id'].isin(event_ids)]
+            df_metadata_filtered = df_metadata_full.loc[df_metadata_full.index.intersection(list(event_ids))]
         else:
-            df_metadata_filtered = df_metadata_full.copy()
+            df_metadata_filtered = df_metadata_full
 
     except Exception as e:
         print(f"[WARNING] Failed to load metadata: {e}")
         df_metadata_full = pd.DataFrame()
         df_metadata_filtered = pd.DataFrame()
 
+    # Validate the stratification config once (drops unusable variables)
+    strat_config = _validate_strat_config(strat_config, df_metadata_full.columns)
+
     # Apply stratified sampling or simple random sampling
     # Use FILTERED metadata for stratification (only available videos)
-    number_of_videos = config['settings'].get('number_of_videos', None)
-    strat_config = config['settings'].get('variables_for_stratification', [])
-
     if strat_config and len(strat_config) > 0:
         # Use stratified sampling
         print(f"[INFO] Applying stratified sampling with {len(strat_config)} variable(s)")
@@ -494,13 +740,16 @@ def initialize_video_player(config):
             videos_to_rate,
             df_metadata_filtered,
             number_of_videos,
-            strat_config
+            strat_config,
+            rng,
+            event_ids=event_ids
         )
     else:
-        # Use simple random sampling
+        # Use simple random sampling (choice() output is already in random order)
         if number_of_videos and number_of_videos < len(videos_to_rate):
-            videos_to_rate = random.sample(videos_to_rate, number_of_videos)
-        random.shuffle(videos_to_rate)
+            videos_to_rate = rng.choice(videos_to_rate, size=number_of_videos, replace=False).tolist()
+        else:
+            rng.shuffle(videos_to_rate)
 
     # Store in session state
     st.session_state.videos_to_rate = videos_to_rate
@@ -509,26 +758,28 @@ def initialize_video_player(config):
 
     # Store FULL metadata (all rows from CSV) - needed for completion screen
     st.session_state.metadata = df_metadata_full
+    # Row lookup by action ID for the metadata bar and pitch (one dict lookup per rerun)
+    st.session_state.metadata_by_id = df_metadata_full[~df_metadata_full.index.duplicated()].to_dict('index')
     st.session_state.video_initialized = True
 
 def display_rating_interface(action_id, video_filename, config):
     """Display the main rating interface with video and scales."""
     user = st.session_state.user
-    metadata = st.session_state.metadata
+    metadata_by_id = st.session_state.get('metadata_by_id')
     rating_scales = st.session_state.rating_scales
 
     # Get video path from local filesystem
     video_path = st.session_state.video_path
 
     # Use shared display function
-    scale_values = display_video_rating_interface(
+    display_video_rating_interface(
         video_filename=video_filename,
         video_path=video_path,
         config=config,
         rating_scales=rating_scales,
         key_prefix="scale_",
         action_id=action_id,
-        metadata=metadata,
+        metadata=metadata_by_id,
         header_content=None,  # No header for main videoplayer
         display_video_func=display_video_with_mode
     )
@@ -548,35 +799,16 @@ def display_rating_interface(action_id, video_filename, config):
                 st.warning("⚠️ Click again to confirm. Unsaved ratings will be lost.")
 
     with col3:
-        if st.button("Submit Rating ▶️", use_container_width=True, type="primary"):
-            # Validate ratings
-            validation_errors = _validate_ratings(scale_values)
-
-            if validation_errors:
-                st.error("⚠️ Please complete the required ratings:")
-                for error in validation_errors:
-                    st.warning(error)
-                st.stop()
-
-            # Save rating
-            if save_rating(user.user_id, action_id, scale_values):
-                st.success("✅ Rating saved successfully!")
-
-                # Track win/loss prediction for this session (for completion screen)
-                win_loss_prediction = scale_values.get('Win or Loss')
-                if win_loss_prediction is not None:
-                    if 'session_ratings' not in st.session_state:
-                        st.session_state.session_ratings = {}
-                    st.session_state.session_ratings[action_id] = win_loss_prediction
-
-                # Move to next video
-                st.session_state.current_video_index += 1
-                st.session_state.confirm_back = False
-
-                # Clear scale values for next video
-                st.rerun()
-            else:
-                st.error("❌ Failed to save rating. Please try again.")
+        # Saving and advancing happen in the callback, before the rerun triggered by the click
+        st.button(
+            "Submit Rating ▶️",
+            use_container_width=True,
+            type="primary",
+            on_click=_submit_and_advance,
+            args=(action_id, video_filename)
+        )
+
+    _show_submit_feedback()
 
 def _validate_ratings(scale_values):
     """
@@ -600,18 +832,15 @@ def _validate_ratings(scale_values):
 
     # Check group requirements
     group_requirements = st.session_state.get('group_requirements', {})
-    rating_scales = st.session_state.get('rating_scales', [])
+    group_to_scales = st.session_state.get('group_to_scales', {})
 
     for group_id, group_info in group_requirements.items():
         required_count = group_info['number_of_ratings']
         error_msg = group_info.get('error_msg', '')
         group_title = group_info.get('title', group_id)
 
-        # Find all scales in this group
-        group_scales = [
-            scale for scale in rating_scales
-            if scale.get('group') == group_id
-        ]
+        # All scales in this group (indexed once when the rating scales were loaded)
+        group_scales = group_to_scales.get(group_id, [])
 
         # Count how many scales in this group have been changed
         changed_count = 0
@@ -625,20 +854,8 @@ def _validate_ratings(scale_values):
 
             # For sliders, check if value has been changed from initial position
             if scale.get('type') == 'slider':
-                initial_state = scale.get('initial_state', 'low')
-                slider_min = scale.get('slider_min', 0)
-                slider_max = scale.get('slider_max', 100)
-
-                # Calculate initial value based on initial_state
-                if initial_state == 'low':
-                    initial_value = slider_min
-                elif initial_state == 'high':
-                    initial_value = slider_max
-                else:  # center
-                    initial_value = (slider_min + slider_max) / 2
-
                 # Count as changed if value is different from initial
-                if value != initial_value:
+                if value != scale['initial_value']:
                     changed_count += 1
             else:
                 # For discrete and text types, any non-empty value counts as changed
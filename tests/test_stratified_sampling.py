@@ -0,0 +1,62 @@
+"""
+Tests for the stratified video sampling in pages/videoplayer.py.
+
+Run from the repository root with: python -m unittest discover
+"""
+import unittest
+
+try:
+    import numpy as np
+    import pandas as pd
+    from pages import videoplayer
+except ModuleNotFoundError:  # the app's dependencies (streamlit, pandas, ...) are not installed
+    videoplayer = None
+
+
+@unittest.skipIf(videoplayer is None, "app dependencies not installed")
+class StratifiedSamplingTest(unittest.TestCase):
+    """Both sampling paths give a level whose share rounds to 0 no videos."""
+
+    def setUp(self):
+        # 40 videos: 30 wins and 10 losses, body part alternating within each
+        self.df = pd.DataFrame({
+            'id': [f"event_{i:03d}" for i in range(40)],
+            'WinLoss': ['Win'] * 30 + ['Loss'] * 10,
+            'bodypart': ['Foot', 'Head'] * 20,
+        }).set_index('id', drop=False).rename_axis(None)
+        self.win_loss = {'variable': 'WinLoss', 'levels': ['Win', 'Loss'],
+                         'proportions': np.array([0.95, 0.05])}
+        self.bodypart = {'variable': 'bodypart', 'levels': ['Foot', 'Head'],
+                         'proportions': np.array([0.5, 0.5])}
+
+    def _losses(self, ids):
+        return [vid for vid in ids if int(vid.split('_')[1]) >= 30]
+
+    def test_single_variable_skips_zero_target_level(self):
+        ids = videoplayer._stratified_sample_single(self.df, self.win_loss, 8, np.random.default_rng(0))
+        self.assertEqual(len(ids), 8)
+        self.assertEqual(self._losses(ids), [])
+
+    def test_recursive_skips_zero_target_level(self):
+        ids = videoplayer._stratified_sample_recursive(
+            self.df, [self.win_loss, self.bodypart], 8, 0, np.random.default_rng(0))
+        self.assertEqual(len(ids), 8)
+        self.assertEqual(self._losses(ids), [])
+
+    def test_one_and_two_variables_select_the_same_number(self):
+        videos = [f"{vid}.mp4" for vid in self.df['id']]
+        one = videoplayer.stratified_sample_videos(
+            list(videos), self.df, 8, [self.win_loss], np.random.default_rng(1))
+        two = videoplayer.stratified_sample_videos(
+            list(videos), self.df, 8, [self.win_loss, self.bodypart], np.random.default_rng(1))
+        self.assertEqual(len(one), 8)
+        self.assertEqual(len(two), 8)
+
+    def test_recursive_without_target_takes_all(self):
+        ids = videoplayer._stratified_sample_recursive(
+            self.df, [self.win_loss, self.bodypart], None, 0, np.random.default_rng(0))
+        self.assertEqual(sorted(ids), sorted(self.df['id']))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,6 @@
+"""
+Utility modules for the rating app (configuration, persistence, Google Sheets, video display).
+
+Always import them through the package (e.g. ``from utils.data_persistence import save_rating``)
+so each module, and its module-level state, is loaded only once.
+"""
@@ -3,6 +3,44 @@ Configuration loader for YAML files.
 """
 import yaml
 import os
+import json
+from collections import defaultdict
+
+try:
+    import orjson
+except ImportError:  # orjson is optional, fall back to the standard library
+    orjson = None
+
+def _load_yaml_cached(path):
+    """
+    Load a YAML file through a JSON sidecar ('<path>.cache.json').
+
+    The sidecar is used when it is at least as new as the YAML file; otherwise the
+    YAML is parsed and the sidecar is (re)written. JSON parses much faster than YAML,
+    so only the first load after an edit pays for the YAML parse.
+    """
+    cache_path = path + '.cache.json'
+    try:
+        if os.path.getmtime(cache_path) >= os.path.getmtime(path):
+            with open(cache_path, 'rb') as file:
+                raw = file.read()
+            return orjson.loads(raw) if orjson is not None else json.loads(raw)
+    except (OSError, ValueError):
+        pass  # Missing, stale or unreadable sidecar: parse the YAML below
+
+    with open(path, 'r') as file:
+        data = yaml.safe_load(file)
+
+    try:
+        raw = orjson.dumps(data) if orjson is not None else json.dumps(data).encode('utf-8')
+        # Only keep the sidecar if it round-trips (e.g. YAML dates would come back as strings)
+        if (orjson.loads(raw) if orjson is not None else json.loads(raw)) == data:
+            with open(cache_path, 'wb') as file:
+                file.write(raw)
+    except (OSError, TypeError, ValueError) as e:
+        print(f"[WARNING] Could not write config cache {cache_path}: {e}")
+
+    return data
 
 def load_config():
     """Load main configuration from config.yaml."""
@@ -10,8 +48,7 @@ def load_config():
     if not os.path.exists(config_path):
         raise FileNotFoundError(f"{config_path} not found")
 
-    with open(config_path, 'r') as file:
-        config = yaml.safe_load(file)
+    config = _load_yaml_cached(config_path)
 
     return config
 
@@ -26,10 +63,9 @@ def load_questionnaire_fields(config):
         print(f"[WARNING] {questionnaire_file} not found, using empty questionnaire fields")
         return []
 
-    with open(questionnaire_file, 'r') as file:
-        all_fields = yaml.safe_load(file)
-        if all_fields is None:
-            return []
+    all_fields = _load_yaml_cached(questionnaire_file)
+    if all_fields is None:
+        return []
 
     # Filter only active fields
     return [field for field in all_fields if field.get('active', False)]
@@ -42,6 +78,11 @@ def load_rating_scales(config):
     - 'scales': list of active rating scales
     - 'groups': list of rating scale groups
     - 'group_requirements': dict mapping group_id to required number of ratings
+    - 'required_scales': titles of scales required individually (not in a group)
+    - 'group_to_scales': dict mapping group_id to its list of active scales
+    - 'scale_key_map': dict mapping scale title to the column key ratings are saved under
+
+    Slider scales additionally get an 'initial_value' entry (the slider's start position).
     """
     rating_scales_file = config['settings'].get(
         'rating_scales_file',
@@ -50,12 +91,13 @@ def load_rating_scales(config):
 
     if not os.path.exists(rating_scales_file):
         print(f"[WARNING] {rating_scales_file} not found, using empty rating scales")
-        return {'scales': [], 'groups': [], 'group_requirements': {}}
+        return {'scales': [], 'groups': [], 'group_requirements': {}, 'required_scales': [], 'group_to_scales': {},
+                'scale_key_map': {}}
 
-    with open(rating_scales_file, 'r') as file:
-        data = yaml.safe_load(file)
-        if data is None:
-            return {'scales': [], 'groups': [], 'group_requirements': {}}
+    data = _load_yaml_cached(rating_scales_file)
+    if data is None:
+        return {'scales': [], 'groups': [], 'group_requirements': {}, 'required_scales': [], 'group_to_scales': {},
+                'scale_key_map': {}}
 
     # Check if this is the old format (list of scales) or new format (dict with groups and scales)
     if isinstance(data, list):
@@ -92,12 +134,47 @@ def load_rating_scales(config):
     # Validate group requirements
     _validate_group_requirements(active_scales, groups, group_requirements)
 
+    # Precompute lookups used when validating every submitted rating
+    required_scales = []
+    group_to_scales = defaultdict(list)
+    scale_key_map = {}
+    for scale in active_scales:
+        title = scale.get('title')
+        if title:
+            # Saved column name (sanitized for JSON compatibility)
+            scale_key_map[title] = title.lower().replace(' ', '_')
+
+        if scale.get('type') == 'slider':
+            scale['initial_value'] = _slider_initial_value(scale)
+
+        group_id = scale.get('group')
+        if group_id:
+            group_to_scales[group_id].append(scale)
+        elif scale.get('required_to_proceed', True):
+            required_scales.append(title)
+
     return {
         'scales': active_scales,
         'groups': groups,
-        'group_requirements': group_requirements
+        'group_requirements': group_requirements,
+        'required_scales': required_scales,
+        'group_to_scales': dict(group_to_scales),
+        'scale_key_map': scale_key_map
     }
 
+def _slider_initial_value(scale):
+    """Return the initial slider position based on initial_state ('low', 'center' or 'high')."""
+    slider_min = scale.get('slider_min', 0)
+    slider_max = scale.get('slider_max', 100)
+    initial_state = scale.get('initial_state', 'low')
+
+    if initial_state == 'low':
+        return float(slider_min)
+    elif initial_state == 'high':
+        return float(slider_max)
+    else:  # 'center' or any other value defaults to center
+        return float(slider_min + slider_max) / 2
+
 def _validate_group_requirements(scales, groups, group_requirements):
     """
     Validate that group requirements are reasonable.
@@ -3,16 +3,95 @@ Data persistence functions for saving and loading user data and ratings.
 Implements flexible storage strategy based on config: local, online, or both.
 """
 import json
+import logging
 import os
+import threading
 import streamlit as st
+from collections import Counter
 from datetime import datetime
+
+try:
+    import orjson
+except ImportError:  # orjson is optional, fall back to the standard library
+    orjson = None
+
 from utils.gsheets_manager import (
     append_rating_to_gsheets,
+    queue_rating_for_gsheets,
     get_rated_videos_for_user_from_gsheets,
     append_user_to_gsheets,
     user_exists_in_gsheets
 )
 
+logger = logging.getLogger(__name__)
+
+# Local ratings are appended to one JSON-lines log; older installs wrote one file
+# per rating to user_ratings/{user_id}_{action_id}.json, which is still read.
+RATINGS_LOG = 'user_ratings.jsonl'
+LEGACY_RATINGS_DIR = 'user_ratings'
+
+# Sessions run as threads of one process, so appends to the log are serialized
+_ratings_log_lock = threading.Lock()
+
+def _json_dumps(obj, indent=False):
+    """Serialize to UTF-8 JSON bytes (compact, or indented by 2 spaces), using orjson if installed."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else 0)
+    if indent:
+        return json.dumps(obj, indent=2).encode('utf-8')
+    return json.dumps(obj, separators=(',', ':')).encode('utf-8')
+
+def _json_loads(data):
+    """Parse JSON from bytes or str, using orjson if installed."""
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+# Directory listings keyed by path: (directory mtime, tuple of entry names)
+_dir_listing_cache = {}
+
+def _dir_cache(path):
+    """
+    List a directory, reusing the previous listing while the directory is unchanged.
+
+    Adding, removing or renaming a file updates the directory's modification time,
+    so the cached names are only re-read after such a change.
+
+    Returns:
+    - Tuple of entry names (empty if the directory does not exist)
+    """
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return ()
+
+    cached = _dir_listing_cache.get(path)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+
+    with os.scandir(path) as it:
+        names = tuple(entry.name for entry in it)
+    _dir_listing_cache[path] = (mtime, names)
+    return names
+
+# Set once user_data/ filenames have been checked for upper-case names (see _lowercase_user_data_files)
+_user_data_files_migrated = False
+
+def _resolve_modes():
+    """
+    Resolve the configured storage_mode into (write_online, write_local) flags.
+
+    The flags are cached in session state and only resolved again when the
+    config object in session state is replaced.
+    """
+    config = st.session_state.get('config', {})
+    cached = st.session_state.get('_storage_flags')
+    if cached is not None and cached[0] == id(config):
+        return cached[1]
+
+    storage_mode = config.get('settings', {}).get('storage_mode', 'both')
+    flags = (storage_mode in ('online', 'both'), storage_mode in ('local', 'both'))
+    st.session_state['_storage_flags'] = (id(config), flags)
+    return flags
+
 def save_user_data(user):
     """
     Save user demographic data based on configured storage_mode.
@@ -32,43 +111,50 @@ def save_user_data(user):
     user_data = user.to_dict()
 
     # Get storage mode from config
-    config = st.session_state.get('config', {})
-    storage_mode = config.get('settings', {}).get('storage_mode', 'both')
+    write_online, write_local = _resolve_modes()
 
     # Track success of each write method
     gsheets_success = False
     local_json_success = False
 
     # ONLINE: Write to Google Sheets
-    if storage_mode in ['online', 'both']:
+    if write_online:
         try:
             gsheets_success = append_user_to_gsheets(user_data, worksheet="v4_ImageText_users")
             if gsheets_success:
-                print(f"[INFO] ✓ User data saved to Google Sheets: {user.user_id}")
+                logger.info("✓ User data saved to Google Sheets: %s", user.user_id)
         except Exception as e:
-            print(f"[WARNING] Google Sheets write failed for user data: {e}")
+            logger.warning("Google Sheets write failed for user data: %s", e)
 
     # LOCAL: Write to local JSON file
-    if storage_mode in ['local', 'both']:
+    if write_local:
         try:
             os.makedirs('user_data', exist_ok=True)
-            filename = f"{user.user_id}.json"
+            # Lower-case filenames make the case-insensitive existence check a single stat
+            filename = f"{user.user_id.lower()}.json"
             path = os.path.join('user_data', filename)
 
-            with open(path, 'w') as f:
-                json.dump(user_data, f, indent=2)
+            # Serialize once and hand the file a single write
+            payload = _json_dumps(user_data, indent=True)
+            # Write to a temporary file and swap it in, so existing links (backups) keep their content
+            tmp_path = path + '.tmp'
+            with open(tmp_path, 'wb', buffering=1 << 20) as f:
+                f.write(payload)
+            os.replace(tmp_path, path)
 
             local_json_success = True
-            print(f"[INFO] ✓ User data saved to local JSON: {filename}")
+            logger.info("✓ User data saved to local JSON: %s", filename)
         except Exception as e:
-            print(f"[WARNING] Local JSON write failed for user data: {e}")
+            logger.warning("Local JSON write failed for user data: %s", e)
 
     # Return True if at least one method succeeded
     success = gsheets_success or local_json_success
     if success:
+        st.session_state[f"_ue_{user.user_id.lower()}"] = True
+        get_all_existing_user_ids.clear()
         return True
     else:
-        print(f"[ERROR] CRITICAL: All storage methods failed for user {user.user_id}")
+        logger.error("CRITICAL: All storage methods failed for user %s", user.user_id)
         return False
 
 def save_rating(user_id, action_id, scale_values):
@@ -76,9 +162,9 @@ def save_rating(user_id, action_id, scale_values):
     Save rating data based on configured storage_mode.
 
     Storage modes:
-    - "local": Save to local JSON only
+    - "local": Append to the local JSONL ratings log only
     - "online": Save to Google Sheets only
-    - "both": Save to both Google Sheets and local JSON
+    - "both": Save to both Google Sheets and the local JSONL ratings log
 
     Parameters:
     - user_id: User identifier
@@ -94,68 +180,195 @@ def save_rating(user_id, action_id, scale_values):
         'id': action_id
     }
 
-    # Add each scale's value
+    # Add each scale's value under its column key (precomputed when the rating scales were loaded)
+    key_map = st.session_state.get('_scale_key_map', {})
     for title, value in scale_values.items():
-        # Use title as key (sanitized for JSON compatibility)
-        key = title.lower().replace(' ', '_')
+        key = key_map.get(title)
+        if key is None:
+            # Use title as key (sanitized for JSON compatibility)
+            key = title.lower().replace(' ', '_')
         rating_data[key] = value
 
-    # Add device information if available in session state
-    device_info = st.session_state.get('device_info', {})
-    if device_info:
-        rating_data['device_type'] = device_info.get('device_type')
-        rating_data['os'] = device_info.get('os')
-        rating_data['browser'] = device_info.get('browser')
-        rating_data['browser_version'] = device_info.get('browser_version')
-        rating_data['maxTouchPoints'] = device_info.get('maxTouchPoints')
-        rating_data['screen_width'] = device_info.get('screen_width')
-        rating_data['screen_height'] = device_info.get('screen_height')
-        rating_data['user_agent'] = device_info.get('user_agent')
+    # Add device information if available in session state (subset prepared by get_device_info_cached)
+    device_fields = st.session_state.get('_device_rating_fields')
+    if device_fields:
+        rating_data.update(device_fields)
+
+    # Time the rating was saved (the local log has one file for all ratings, so its
+    # mtime can't tell); the Google Sheets row reuses it so both copies match
+    rating_data['timestamp'] = datetime.now().isoformat()
 
     # Get storage mode from config
-    config = st.session_state.get('config', {})
-    storage_mode = config.get('settings', {}).get('storage_mode', 'both')
+    write_online, write_local = _resolve_modes()
 
     # Track success of each write method
     gsheets_success = False
     local_json_success = False
 
-    # ONLINE: Write to Google Sheets
-    if storage_mode in ['online', 'both']:
+    # LOCAL: Append one line to the local JSONL ratings log (first, so Sheets can be written in the background)
+    if write_local:
         try:
-            gsheets_success = append_rating_to_gsheets(rating_data, worksheet="v4_ImageText_ratings")
-            if gsheets_success:
-                print(f"[INFO] ✓ Rating saved to Google Sheets: {user_id}_{action_id}")
+            # Serialize once and hand the file a single write (compact: the log is machine-read)
+            payload = _json_dumps(rating_data) + b'\n'
+            with _ratings_log_lock, open(RATINGS_LOG, 'ab', buffering=1 << 20) as f:
+                f.write(payload)
+            local_json_success = True
+            logger.info("✓ Rating saved to local JSONL: %s_%s", user_id, action_id)
         except Exception as e:
-            print(f"[WARNING] Google Sheets write failed: {e}")
+            logger.warning("Local JSONL write failed: %s", e)
 
-    # LOCAL: Write to local JSON file
-    if storage_mode in ['local', 'both']:
+    # ONLINE: Write to Google Sheets. A rating that is already in the local log is queued
+    # and appended in batches by a background thread; otherwise it is written before
+    # returning, so it never exists only in the in-memory queue and a failure is reported.
+    if write_online:
         try:
-            os.makedirs('user_ratings', exist_ok=True)
-            filename = os.path.join('user_ratings', f"{user_id}_{action_id}.json")
-            with open(filename, 'w') as f:
-                json.dump(rating_data, f, indent=2)
-            local_json_success = True
-            print(f"[INFO] ✓ Rating saved to local JSON: {user_id}_{action_id}.json")
+            if local_json_success:
+                gsheets_success = queue_rating_for_gsheets(rating_data, worksheet="v4_ImageText_ratings")
+                if gsheets_success:
+                    logger.info("✓ Rating queued for Google Sheets: %s_%s", user_id, action_id)
+            else:
+                gsheets_success = append_rating_to_gsheets(rating_data, worksheet="v4_ImageText_ratings")
+                if gsheets_success:
+                    logger.info("✓ Rating saved to Google Sheets: %s_%s", user_id, action_id)
         except Exception as e:
-            print(f"[WARNING] Local JSON write failed: {e}")
+            logger.warning("Google Sheets write failed: %s", e)
 
     # Return True if at least one method succeeded
     success = gsheets_success or local_json_success
     if success:
+        # Keep the cached rated-videos list current (only if it was already loaded)
+        rated_videos = st.session_state.get(f"_rv_{user_id.lower()}")
+        if rated_videos is not None:
+            rated_videos.add(action_id)
         return True
     else:
-        print(f"[ERROR] CRITICAL: All storage methods failed for {user_id}_{action_id}")
+        logger.error("CRITICAL: All storage methods failed for %s_%s", user_id, action_id)
         return False
 
+def _lowercase_user_data_files():
+    """
+    Rename user_data/ files written by older versions to lower-case names (once per process).
+
+    User files used to be named after the user ID as typed; they are now stored as
+    {user_id.lower()}.json so existence can be checked without listing the folder.
+    A file is left alone if its lower-case name is already taken.
+    """
+    global _user_data_files_migrated
+
+    if _user_data_files_migrated:
+        return
+    _user_data_files_migrated = True
+
+    if not os.path.exists('user_data'):
+        return
+
+    for filename in os.listdir('user_data'):
+        if filename.endswith('.json') and filename != filename.lower():
+            target = os.path.join('user_data', filename.lower())
+            if os.path.exists(target):
+                logger.warning("Not renaming user_data/%s: %s already exists", filename, filename.lower())
+                continue
+            try:
+                os.rename(os.path.join('user_data', filename), target)
+            except OSError as e:
+                logger.warning("Failed to rename user_data/%s: %s", filename, e)
+
+def _iter_logged_ratings():
+    """
+    Yield rating records from the local JSONL ratings log.
+
+    Lines that cannot be parsed (e.g. a partial line after a crash) are skipped.
+    """
+    if not os.path.exists(RATINGS_LOG):
+        return
+
+    with open(RATINGS_LOG, 'rb') as f:
+        for line in f:
+            try:
+                yield _json_loads(line)
+            except ValueError:
+                continue
+
+def _iter_legacy_rating_files():
+    """
+    Yield (user_id, action_id) pairs from legacy per-rating files in user_ratings/.
+
+    Filenames have the form {user_id}_{action_id}.json (action IDs may contain underscores).
+    """
+    for f in _dir_cache(LEGACY_RATINGS_DIR):
+        if f.endswith('.json') and '_' in f:
+            file_user_id, action_id = f[:-5].split('_', 1)
+            yield file_user_id, action_id
+
+# Parsed ratings log: (mtime_ns, size, counts per action ID, action IDs per lower-cased user ID)
+_ratings_log_index_cache = None
+
+def _ratings_log_index():
+    """
+    Index the local JSONL ratings log, re-parsing it only when the file has changed.
+
+    The log is only ever appended to, so its size and modification time identify
+    its content; sessions share the parsed result instead of each reading the whole log.
+
+    Returns:
+    - Tuple (counts, rated_by_user): Counter of ratings per action ID and a dict
+      mapping lower-cased user IDs to the set of action IDs they rated (treat as read-only)
+    """
+    global _ratings_log_index_cache
+
+    try:
+        stat = os.stat(RATINGS_LOG)
+    except FileNotFoundError:
+        return Counter(), {}
+
+    cached = _ratings_log_index_cache
+    if cached is not None and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+        return cached[2], cached[3]
+
+    counts = Counter()
+    rated_by_user = {}
+    for record in _iter_logged_ratings():
+        action_id = str(record.get('id'))
+        counts[action_id] += 1
+        rated_by_user.setdefault(str(record.get('user_id', '')).lower(), set()).add(action_id)
+
+    _ratings_log_index_cache = (stat.st_mtime_ns, stat.st_size, counts, rated_by_user)
+    return counts, rated_by_user
+
+def _legacy_rated_ids_for_user(user_id):
+    """
+    Return the action IDs from a user's legacy per-rating files in user_ratings/ (case-insensitive).
+    """
+    # Filenames are {user_id}_{action_id}.json: match the prefix once, then slice out the action ID
+    prefix = f"{user_id.lower()}_"
+    prefix_len = len(prefix)
+    return [
+        f[prefix_len:-5] for f in _dir_cache(LEGACY_RATINGS_DIR)
+        if f.endswith('.json') and f.lower().startswith(prefix)
+    ]
+
+def count_ratings_per_video():
+    """
+    Count the locally stored ratings per video.
+
+    Returns:
+    - Counter mapping action ID to number of ratings (empty if nothing is stored locally)
+    """
+    counts = Counter(_ratings_log_index()[0])
+    counts.update(action_id for _, action_id in _iter_legacy_rating_files())
+    return counts
+
+@st.cache_data(ttl=60, show_spinner=False)
 def get_all_existing_user_ids():
     """
     Get all existing user IDs from the system.
     Tries both Google Sheets and local JSON, combines results.
 
+    Cached for 60 seconds across sessions; save_user_data clears the cache
+    so a new signup is visible immediately.
+
     Returns:
-    - List of all unique user IDs
+    - Tuple of all unique user IDs
     """
     user_ids = set()
 
@@ -164,115 +377,145 @@ def get_all_existing_user_ids():
         from utils.gsheets_manager import get_all_user_ids_from_gsheets
         gsheets_ids = get_all_user_ids_from_gsheets(worksheet="v4_ImageText_users")
         user_ids.update(gsheets_ids)
-        print(f"[INFO] Retrieved {len(gsheets_ids)} user IDs from Google Sheets")
+        logger.info("Retrieved %s user IDs from Google Sheets", len(gsheets_ids))
     except Exception as e:
-        print(f"[WARNING] Failed to get user IDs from Google Sheets: {e}")
+        logger.warning("Failed to get user IDs from Google Sheets: %s", e)
 
     # Also check local JSON files
     try:
+        _lowercase_user_data_files()
         if os.path.exists('user_data'):
-            for filename in os.listdir('user_data'):
+            for filename in _dir_cache('user_data'):
                 if filename.endswith('.json'):
-                    user_id = filename.replace('.json', '')
-                    user_ids.add(user_id)
-            print(f"[INFO] Found {len(user_ids)} total unique user IDs")
+                    user_ids.add(filename[:-5])
+            logger.info("Found %s total unique user IDs", len(user_ids))
     except Exception as e:
-        print(f"[WARNING] Failed to get user IDs from local files: {e}")
+        logger.warning("Failed to get user IDs from local files: %s", e)
 
-    return list(user_ids)
+    return tuple(user_ids)
 
 def user_exists(user_id):
     """
     Check if a user_id exists in the system (case-insensitive).
     Tries Google Sheets first (primary), falls back to local JSON (backup).
 
+    The result is cached in session state, so reruns don't repeat the lookup.
+    A "not found" is only cached if Google Sheets answered (or isn't used by the
+    storage mode), so a transient Sheets error is retried on the next call.
+
     Parameters:
     - user_id: User identifier to check
 
     Returns:
     - True if user has at least one rating file, False otherwise
     """
+    key = f"_ue_{user_id.lower()}"
+    cached = st.session_state.get(key)
+    if cached is not None:
+        return cached
+
+    exists, authoritative = _user_exists_uncached(user_id)
+    if exists or authoritative:
+        st.session_state[key] = exists
+    return exists
+
+def _user_exists_uncached(user_id):
+    """
+    Look up whether a user exists in Google Sheets or the local files (see user_exists).
+
+    Returns:
+    - Tuple (exists, authoritative); authoritative is False if a negative answer
+      may be wrong because Google Sheets could not be read
+    """
+    write_online, _ = _resolve_modes()
+    sheets_checked = False
+
     # PRIMARY: Try Google Sheets first
     try:
         if user_exists_in_gsheets(user_id, worksheet="v4_ImageText_users"):
-            print(f"[INFO] User {user_id} found in Google Sheets")
-            return True
+            logger.info("User %s found in Google Sheets", user_id)
+            return True, True
+        sheets_checked = True
     except Exception as e:
-        print(f"[WARNING] Failed to check user existence in Google Sheets: {e}")
+        logger.warning("Failed to check user existence in Google Sheets: %s", e)
 
     # FALLBACK: Check local JSON files (case-insensitive)
     try:
-        if not os.path.exists('user_data'):
-            return False
-
-        # Check in user_data folder (primary storage for user info) - case insensitive
+        # Check in user_data folder (primary storage for user info); filenames are lower-case
+        _lowercase_user_data_files()
         user_id_lower = user_id.lower()
-        for filename in os.listdir('user_data'):
-            if filename.endswith('.json'):
-                file_user_id = filename.replace('.json', '').lower()
-                if file_user_id == user_id_lower:
-                    print(f"[INFO] User {user_id} found in local JSON files")
-                    return True
-
-        # Also check user_ratings as fallback - case insensitive
-        if not os.path.exists('user_ratings'):
-            return False
-
-        user_ratings_files = os.listdir('user_ratings')
-        for f in user_ratings_files:
-            if '_' in f and f.endswith('.json'):
-                file_user_id = f.split('_')[0].lower()
-                if file_user_id == user_id_lower:
-                    print(f"[INFO] User {user_id} found in local JSON files")
-                    return True
+        if os.path.isfile(os.path.join('user_data', f"{user_id_lower}.json")):
+            logger.info("User %s found in local JSON files", user_id)
+            return True, True
 
-        return False
+        # Also check the local ratings as fallback - case insensitive
+        if user_id_lower in _ratings_log_index()[1]:
+            logger.info("User %s found in local ratings log", user_id)
+            return True, True
+
+        if _legacy_rated_ids_for_user(user_id):
+            logger.info("User %s found in local JSON files", user_id)
+            return True, True
+
+        return False, sheets_checked or not write_online
     except Exception as e:
-        print(f"[ERROR] Failed to check user existence in both sources: {e}")
-        return False
+        logger.error("Failed to check user existence in both sources: %s", e)
+        return False, False
 
 def get_rated_videos_for_user(user_id):
     """
     Get list of video IDs already rated by a user (case-insensitive).
     Tries Google Sheets first (primary), falls back to local JSON (backup).
 
+    The result is cached in session state and kept current by save_rating,
+    so reruns don't repeat the lookup. A result from the local fallback is not
+    cached if Google Sheets could not be read, so the next call tries Sheets again.
+
     Parameters:
     - user_id: User identifier
 
     Returns:
-    - List of action IDs (without .mp4 extension)
+    - Set of action IDs (without .mp4 extension)
+    """
+    key = f"_rv_{user_id.lower()}"
+    cached = st.session_state.get(key)
+    if cached is not None:
+        return cached
+
+    rated_ids, authoritative = _get_rated_videos_for_user_uncached(user_id)
+    if authoritative:
+        st.session_state[key] = rated_ids
+    return rated_ids
+
+def _get_rated_videos_for_user_uncached(user_id):
     """
+    Look up the videos rated by a user in Google Sheets or the local files (see get_rated_videos_for_user).
+
+    Returns:
+    - Tuple (rated_ids, authoritative); authoritative is False if the result may be
+      incomplete because Google Sheets could not be read
+    """
+    write_online, _ = _resolve_modes()
+    sheets_checked = False
+
     # PRIMARY: Try Google Sheets first
     try:
         gsheets_ids = get_rated_videos_for_user_from_gsheets(user_id, worksheet="v4_ImageText_ratings")
+        sheets_checked = True
         if gsheets_ids:
-            print(f"[INFO] Retrieved {len(gsheets_ids)} rated videos from Google Sheets for user {user_id}")
-            return gsheets_ids
+            logger.info("Retrieved %s rated videos from Google Sheets for user %s", len(gsheets_ids), user_id)
+            return gsheets_ids, True
     except Exception as e:
-        print(f"[WARNING] Failed to get rated videos from Google Sheets: {e}")
+        logger.warning("Failed to get rated videos from Google Sheets: %s", e)
 
-    # FALLBACK: Use local JSON files (case-insensitive)
+    # FALLBACK: Use the local ratings log and legacy JSON files (case-insensitive)
     try:
-        if not os.path.exists('user_ratings'):
-            return []
-
-        files = os.listdir('user_ratings')
-        rated_ids = []
         user_id_lower = user_id.lower()
+        rated_ids = set(_ratings_log_index()[1].get(user_id_lower, ()))
+        rated_ids.update(_legacy_rated_ids_for_user(user_id))
 
-        for f in files:
-            if f.endswith('.json') and '_' in f:
-                # Extract user_id from filename (case-insensitive match)
-                file_user_id = f.split('_')[0].lower()
-                if file_user_id == user_id_lower:
-                    # Extract action_id from filename: {user_id}_{action_id}.json
-                    parts = f.replace('.json', '').split('_', 1)
-                    if len(parts) > 1:
-                        action_id = parts[1]
-                        rated_ids.append(action_id)
-
-        print(f"[INFO] Retrieved {len(rated_ids)} rated videos from JSON backup for user {user_id}")
-        return rated_ids
+        logger.info("Retrieved %s rated videos from local backup for user %s", len(rated_ids), user_id)
+        return rated_ids, sheets_checked or not write_online
     except Exception as e:
-        print(f"[ERROR] Failed to get rated videos from both sources: {e}")
-        return []
+        logger.error("Failed to get rated videos from both sources: %s", e)
+        return set(), False
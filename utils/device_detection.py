@@ -4,10 +4,13 @@ Device detection utility using User-Agent parsing and JavaScript signals.
 This module provides comprehensive device, OS, and browser detection for
 collecting metadata alongside user ratings.
 """
+import json
 import streamlit as st
 from user_agents import parse
 from streamlit_js_eval import streamlit_js_eval
 
+from utils.rating_fields import DEVICE_RATING_FIELDS
+
 
 def get_device_info() -> dict:
     """
@@ -31,12 +34,29 @@ def get_device_info() -> dict:
     # Get User-Agent from Streamlit context headers
     ua_raw = st.context.headers.get("User-Agent", "")
 
-    # Get JavaScript signals (best-effort; may be None on first render)
-    inner_width = streamlit_js_eval(js_expressions="window.innerWidth", key="device_win_w")
-    inner_height = streamlit_js_eval(js_expressions="window.innerHeight", key="device_win_h")
-    max_touch_points = streamlit_js_eval(js_expressions="navigator.maxTouchPoints", key="device_touch_pts")
-    screen_width = streamlit_js_eval(js_expressions="window.screen.width", key="device_screen_w")
-    screen_height = streamlit_js_eval(js_expressions="window.screen.height", key="device_screen_h")
+    # Get JavaScript signals in a single round-trip (best-effort; may be None on first render)
+    js_blob = streamlit_js_eval(
+        js_expressions=(
+            "JSON.stringify({"
+            "innerWidth: window.innerWidth, "
+            "innerHeight: window.innerHeight, "
+            "maxTouchPoints: navigator.maxTouchPoints, "
+            "screenWidth: window.screen.width, "
+            "screenHeight: window.screen.height"
+            "})"
+        ),
+        key="device_info_blob"
+    )
+    try:
+        js_info = json.loads(js_blob) if js_blob else {}
+    except (TypeError, ValueError):
+        js_info = {}
+
+    inner_width = js_info.get("innerWidth")
+    inner_height = js_info.get("innerHeight")
+    max_touch_points = js_info.get("maxTouchPoints")
+    screen_width = js_info.get("screenWidth")
+    screen_height = js_info.get("screenHeight")
 
     # Parse User-Agent
     ua = parse(ua_raw or "")
@@ -90,6 +110,11 @@ def get_device_info_cached() -> dict:
         dict: Device information (same format as get_device_info())
     """
     if 'device_info' not in st.session_state:
-        st.session_state.device_info = get_device_info()
+        device_info = get_device_info()
+        st.session_state.device_info = device_info
+        # Subset saved with every rating, built once per session
+        st.session_state._device_rating_fields = {
+            field: device_info.get(field) for field in DEVICE_RATING_FIELDS
+        }
 
     return st.session_state.device_info
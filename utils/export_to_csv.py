@@ -4,16 +4,62 @@ Adapted from write_ratings2csv.py in the original Kivy app.
 """
 import json
 import shutil
+import sys
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
+import numpy as np
 import os
 from datetime import datetime
 
+if not __package__:
+    # Run as a script (python utils/export_to_csv.py): make the repository root importable
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Both modules only need the standard library and PyYAML (no Streamlit)
+from utils.config_loader import load_config, load_rating_scales
+from utils.rating_fields import DEVICE_RATING_FIELDS
+
+# Columns saved with every rating that are not rating scales
+NON_SCALE_COLUMNS = frozenset({'user_id', 'user_id_lower', 'id', 'timestamp', 'rating_key',
+                               'file_created_at', 'filename', *DEVICE_RATING_FIELDS})
+
+try:
+    import orjson
+except ImportError:  # orjson is optional, fall back to the standard library
+    orjson = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow is optional here, only the Parquet copy needs it
+    pa = None
+
+def _json_loads(data):
+    """Parse JSON from bytes, using orjson if installed."""
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+def _read_json_records(filepath):
+    """Read one JSON file and return its records as a list of dicts."""
+    with open(filepath, 'rb') as f:
+        data = _json_loads(f.read())
+
+    # Handle both single dict and list of dicts
+    if isinstance(data, dict):
+        return [data]
+    elif not isinstance(data, list):
+        return [{'content': data}]
+    return data
+
 def load_json_files_with_datetime(path, file_type='ratings'):
     """
     Load all JSON files from a directory and add creation datetime.
 
+    A path to a JSON-lines file (.jsonl) is read in one pass instead; its records
+    get their own 'timestamp' (the log file's modification time for older lines
+    without one) and the log file's name.
+
     Parameters:
-    - path: directory path containing JSON files
+    - path: directory path containing JSON files, or path to a .jsonl file
     - file_type: string to identify the type of data (for column naming)
 
     Returns:
@@ -24,33 +70,172 @@ def load_json_files_with_datetime(path, file_type='ratings'):
     if not os.path.exists(path):
         return pd.DataFrame()
 
-    for filename in os.listdir(path):
-        if filename.endswith('.json'):
-            filepath = os.path.join(path, filename)
+    if path.endswith('.jsonl'):
+        # Parse line by line like the app's reader: a partial last line (e.g. after a
+        # crash during an append) is skipped with a warning instead of failing the export
+        records = []
+        with open(path, 'rb') as f:
+            for line_number, line in enumerate(f, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    records.append(_json_loads(line))
+                except ValueError as e:
+                    print(f"[WARNING] Skipping unreadable line {line_number} in {path}: {e}")
+
+        if not records:
+            return pd.DataFrame()
+
+        df = pd.DataFrame.from_records(records)
+        # Each record carries the time it was saved; lines written before that field
+        # existed fall back to the log's modification time
+        file_mtime = datetime.fromtimestamp(os.path.getmtime(path))
+        if 'timestamp' in df.columns:
+            df['file_created_at'] = pd.to_datetime(df['timestamp'], format='ISO8601', errors='coerce').fillna(file_mtime)
+        else:
+            df['file_created_at'] = file_mtime
+        df['filename'] = os.path.basename(path)
+        return df
+
+    # scandir returns the entries' stat data without a separate call per file
+    with os.scandir(path) as it:
+        entries = [(entry.name, entry.path, entry.stat().st_mtime) for entry in it if entry.name.endswith('.json')]
+
+    # Reading many small files is I/O-bound, so overlap the reads in a thread pool
+    with ThreadPoolExecutor(max_workers=32) as executor:
+        results = list(executor.map(_read_json_records, [filepath for _, filepath, _ in entries]))
+
+    counts = []
+    for data in results:
+        all_data.extend(data)
+        counts.append(len(data))
+
+    if not all_data:
+        return pd.DataFrame()
 
-            # Get file modification time
-            modification_time = os.path.getmtime(filepath)
-            creation_datetime = datetime.fromtimestamp(modification_time)
+    # Build the frame in one go and add the per-file columns vectorized (one value per file, repeated per record)
+    df = pd.DataFrame.from_records(all_data)
+    creation_datetimes = np.array([datetime.fromtimestamp(mtime) for _, _, mtime in entries], dtype='datetime64[us]')
+    df['file_created_at'] = np.repeat(creation_datetimes, counts)
+    df['filename'] = np.repeat(np.array([name for name, _, _ in entries], dtype=object), counts)
+    return df
 
-            # Load JSON file
-            with open(filepath, 'r') as f:
-                data = json.load(f)
+def _write_csv(df, path, index=False):
+    """
+    Write a DataFrame to CSV with pandas, through a file handle with a 1 MiB buffer.
 
-            # Handle both single dict and list of dicts
-            if isinstance(data, dict):
-                data = [data]
-            elif not isinstance(data, list):
-                data = [{'content': data}]
+    pandas' to_csv is kept (rather than pyarrow's writer) because it defines the file
+    format downstream tools expect: strings are only quoted when needed, datetimes
+    and whole-number floats (e.g. 2.0) are printed as before.
+    """
+    with open(path, 'w', buffering=1 << 20, newline='') as f:
+        df.to_csv(f, index=index)
 
-            # Add metadata to each record
-            for record in data:
-                record['file_created_at'] = creation_datetime
-                record['filename'] = filename
+def _write_parquet(df, path):
+    """Write a DataFrame to a zstd-compressed Parquet file (skipped without pyarrow)."""
+    if pa is None:
+        return
 
-            all_data.extend(data)
+    try:
+        pq.write_table(pa.Table.from_pandas(df, preserve_index=False), path, compression='zstd')
+    except (pa.ArrowException, ValueError, TypeError) as e:
+        print(f"[WARNING] Failed to write {path}: {e}")
 
-    df = pd.DataFrame(all_data)
-    return df
+def _backup_file(src, dst, hardlink=True):
+    """
+    Back up a single file, skipping it if the backup is already up to date.
+
+    A backup with the same size and modification time as the source is left alone.
+    Otherwise the file is hardlinked (no data is copied) or, if linking is not
+    possible (e.g. another filesystem) or not wanted, copied with its metadata.
+    """
+    src_stat = os.stat(src)
+    try:
+        dst_stat = os.stat(dst)
+        if dst_stat.st_size == src_stat.st_size and dst_stat.st_mtime == src_stat.st_mtime:
+            return
+        os.remove(dst)
+    except FileNotFoundError:
+        pass
+
+    if hardlink:
+        try:
+            os.link(src, dst)
+            return
+        except OSError:
+            pass
+    shutil.copy2(src, dst)
+
+def _aggregate_ratings(df_ratings, scale_columns):
+    """
+    Count, mean and standard deviation of the scale columns per action ID.
+
+    Same result as df_ratings.groupby('id').agg(...) with 'count', 'mean' and 'std'
+    (ddof=1), but computed from one factorization of the IDs and np.bincount per
+    column. Only numeric scale columns get a mean and std; text columns (and
+    device information) cannot be averaged and are skipped.
+
+    Parameters:
+    - df_ratings: DataFrame with one row per rating and an 'id' column
+    - scale_columns: Columns to aggregate (the first one is used for num_ratings)
+
+    Returns:
+    - DataFrame indexed by 'id' with num_ratings, mean_<scale> and std_<scale> columns
+    """
+    codes, uniques = pd.factorize(df_ratings['id'], sort=True)
+    valid = codes >= 0  # Rows without an ID are dropped, as in groupby
+    codes = codes[valid]
+    n_groups = len(uniques)
+
+    # Add count using the first scale column (or 'id' if no scales found)
+    count_column = scale_columns[0] if scale_columns else 'id'
+    counted = df_ratings[count_column].notna().to_numpy()[valid]
+    aggregated = {'num_ratings': np.bincount(codes[counted], minlength=n_groups)}
+
+    # Add mean and std for each numeric scale column (NaN values are ignored, as in pandas)
+    for scale_col in scale_columns:
+        if not pd.api.types.is_numeric_dtype(df_ratings[scale_col]):
+            continue
+
+        values = df_ratings[scale_col].to_numpy(dtype=float, na_value=np.nan)[valid]
+        present = ~np.isnan(values)
+        value_codes = codes[present]
+        values = values[present]
+
+        count = np.bincount(value_codes, minlength=n_groups)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = np.bincount(value_codes, weights=values, minlength=n_groups) / count
+            # Two-pass variance (sum of squared deviations from the group mean) for accuracy
+            deviations = values - mean[value_codes]
+            squared = np.bincount(value_codes, weights=deviations * deviations, minlength=n_groups)
+            variance = np.where(count > 1, squared / np.maximum(count - 1, 1), np.nan)
+
+        aggregated[f'mean_{scale_col}'] = mean
+        aggregated[f'std_{scale_col}'] = np.sqrt(variance)
+
+    return pd.DataFrame(aggregated, index=pd.Index(uniques, name='id'))
+
+def _scale_columns(df_ratings):
+    """
+    Determine the rating scale columns to aggregate.
+
+    Uses the column keys of the active rating scales from the config; if the config
+    can't be loaded (or none of its scales were rated), every column that isn't
+    metadata or device information (NON_SCALE_COLUMNS) is used instead.
+
+    Returns:
+    - List of column names present in df_ratings
+    """
+    try:
+        scale_keys = load_rating_scales(load_config())['scale_key_map'].values()
+        columns = [key for key in dict.fromkeys(scale_keys) if key in df_ratings.columns]
+        if columns:
+            return columns
+        print("[WARNING] No configured rating scale found in the ratings, detecting scale columns")
+    except Exception as e:
+        print(f"[WARNING] Could not load the rating scales config, detecting scale columns: {e}")
+
+    return [col for col in df_ratings.columns if col not in NON_SCALE_COLUMNS]
 
 def export_all_data():
     """
@@ -58,42 +243,33 @@ def export_all_data():
     Creates output directory and backup of JSON files.
     """
     userdata_path = 'user_data/'
-    ratings_path = 'user_ratings/'
+    ratings_path = 'user_ratings/'  # Legacy per-rating JSON files
+    ratings_log_path = 'user_ratings.jsonl'
     output_path = 'output/'
 
     # Create output directory
     os.makedirs(output_path, exist_ok=True)
 
-    # Load ratings
-    df_ratings = load_json_files_with_datetime(ratings_path, 'ratings')
+    # Load ratings (JSONL log plus any legacy per-rating files)
+    df_ratings = pd.concat([
+        load_json_files_with_datetime(ratings_log_path, 'ratings'),
+        load_json_files_with_datetime(ratings_path, 'ratings')
+    ], ignore_index=True)
 
     if not df_ratings.empty:
-        df_ratings.to_csv(f'{output_path}ratings.csv', index=False)
+        _write_csv(df_ratings, f'{output_path}ratings.csv')
+        _write_parquet(df_ratings, f'{output_path}ratings.parquet')
         print(f"Loaded {len(df_ratings)} ratings from {df_ratings['filename'].nunique()} files")
         print(f"Number of rated actions: {df_ratings['id'].nunique()}")
 
-        # Dynamically identify scale columns
-        metadata_columns = ['user_id', 'id', 'file_created_at', 'filename']
-        all_columns = df_ratings.columns.tolist()
-        scale_columns = [col for col in all_columns if col not in metadata_columns]
+        # Rating scale columns (from the active rating scales config)
+        scale_columns = _scale_columns(df_ratings)
 
         print(f"Detected scale columns: {scale_columns}")
 
-        # Build dynamic aggregation dictionary
-        agg_dict = {}
-
-        # Add count using the first scale column (or 'id' if no scales found)
-        count_column = scale_columns[0] if scale_columns else 'id'
-        agg_dict['num_ratings'] = (count_column, 'count')
-
-        # Add mean and std for each scale column
-        for scale_col in scale_columns:
-            agg_dict[f'mean_{scale_col}'] = (scale_col, 'mean')
-            agg_dict[f'std_{scale_col}'] = (scale_col, 'std')
-
         # Store mean ratings per action
-        df_mean_ratings = df_ratings.groupby('id').agg(**agg_dict).round(3)
-        df_mean_ratings.to_csv(f'{output_path}mean_ratings.csv')
+        df_mean_ratings = _aggregate_ratings(df_ratings, scale_columns).round(3)
+        _write_csv(df_mean_ratings, f'{output_path}mean_ratings.csv', index=True)
     else:
         print("No ratings data found")
 
@@ -101,7 +277,7 @@ def export_all_data():
     df_users = load_json_files_with_datetime(userdata_path, 'users')
 
     if not df_users.empty:
-        df_users.to_csv(f'{output_path}users.csv', index=False)
+        _write_csv(df_users, f'{output_path}users.csv')
         print(f"\nLoaded {len(df_users)} user records from {df_users['filename'].nunique()} files")
         print(f"Number of unique users: {df_users['user_id'].nunique()}")
     else:
@@ -144,21 +320,16 @@ def export_all_data():
     os.makedirs('backup/user_data/', exist_ok=True)
     os.makedirs('backup/user_ratings/', exist_ok=True)
 
-    if os.path.exists(userdata_path):
-        for filename in os.listdir(userdata_path):
-            if filename.endswith('.json'):
-                shutil.copy(
-                    os.path.join(userdata_path, filename),
-                    os.path.join('backup/user_data/', filename)
-                )
-
-    if os.path.exists(ratings_path):
-        for filename in os.listdir(ratings_path):
-            if filename.endswith('.json'):
-                shutil.copy(
-                    os.path.join(ratings_path, filename),
-                    os.path.join('backup/user_ratings/', filename)
-                )
+    for source_path, backup_path in [(userdata_path, 'backup/user_data/'), (ratings_path, 'backup/user_ratings/')]:
+        if os.path.exists(source_path):
+            with os.scandir(source_path) as it:
+                for entry in it:
+                    if entry.name.endswith('.json'):
+                        _backup_file(entry.path, os.path.join(backup_path, entry.name))
+
+    # The ratings log is appended to in place, so it is copied rather than hardlinked
+    if os.path.exists(ratings_log_path):
+        _backup_file(ratings_log_path, os.path.join('backup/', ratings_log_path), hardlink=False)
 
     print("\n[INFO] Backup of JSON files completed.")
     print("[INFO] Export completed successfully!")
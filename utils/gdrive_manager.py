@@ -3,6 +3,8 @@ Local video file manager.
 Handles video file operations from local filesystem.
 """
 import os
+import base64
+from io import BytesIO
 
 
 def get_all_video_filenames(folder_path):
@@ -54,3 +56,26 @@ def get_video_path(filename, folder_path):
         return None
 
     return full_path
+
+
+def encode_video_base64(file_path, chunk_size=57 * 1024):
+    """
+    Base64-encode a video file in chunks.
+
+    Reading and encoding the whole file at once keeps the raw bytes, the encoded
+    bytes and the decoded string in memory together. Encoding block by block only
+    keeps the encoded output plus one chunk. The chunk size is a multiple of 3,
+    so the encoded blocks concatenate without padding in between.
+
+    Args:
+        file_path: Path to the video file
+        chunk_size: Number of bytes to read per block (must be a multiple of 3)
+
+    Returns:
+        Base64-encoded file contents as an ASCII string
+    """
+    buf = BytesIO()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(chunk_size), b''):
+            buf.write(base64.b64encode(block))
+    return buf.getvalue().decode('ascii')
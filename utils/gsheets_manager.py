@@ -3,35 +3,41 @@ Google Sheets manager for data persistence.
 Handles connections and write operations to Google Sheets.
 """
 import streamlit as st
-from streamlit_gsheets import GSheetsConnection
-import pandas as pd
 from datetime import datetime
-import gspread
-from google.oauth2.service_account import Credentials
+import atexit
+import threading
+import time
+from itertools import zip_longest
+
+# gspread, google-auth and pandas are imported on first use (see get_gspread_client and
+# the read functions), so importing this module does not slow down the app's cold start
 
 # Global connection cache
-_gsheets_connection = None
 _gspread_client = None
-
-def get_gsheets_connection():
-    """
-    Get or create a cached Google Sheets connection.
-
-    Returns:
-        GSheetsConnection object or None if connection fails
-    """
-    global _gsheets_connection
-
-    if _gsheets_connection is None:
-        try:
-            _gsheets_connection = st.connection("gsheets", type=GSheetsConnection)
-            print("[INFO] Google Sheets connection established")
-        except Exception as e:
-            print(f"[ERROR] Failed to create Google Sheets connection: {e}")
-            return None
-
-    return _gsheets_connection
-
+_spreadsheet_handle = None
+
+# Ratings waiting to be appended in one batch: list of (worksheet, row dict)
+RATING_BATCH_SIZE = 5
+RATING_FLUSH_IDLE = 2.0  # seconds without a new rating before a partial batch is written
+RATING_MAX_ROWS_PER_REQUEST = 50  # a backlog (e.g. after failures) is written in chunks of this size
+RATING_RETRY_BACKOFF = 2.0  # seconds before the first retry of a failed flush, doubled per failure
+RATING_RETRY_BACKOFF_MAX = 60.0
+_rating_queue = []
+_rating_last_queued = 0.0  # time.monotonic() of the most recent queue_rating_for_gsheets call
+_rating_queue_lock = threading.Lock()
+_rating_flush_event = threading.Event()
+_rating_flush_lock = threading.Lock()  # One flush at a time (background thread vs. atexit)
+_rating_flush_thread = None
+# rating_key of rows whose failed append may still have reached the sheet (e.g. a timeout
+# after the server applied it); checked against the sheet before they are appended again
+_rating_unconfirmed_keys = set()
+
+# Header row per worksheet name, read once and kept in sync by _append_rows_to_gsheets
+_header_cache = {}
+_known_headers_set = {}  # Same headers as a frozenset, for the "any new columns?" check
+
+# gspread Worksheet per worksheet name, looked up (or created) once
+_worksheet_cache = {}
 
 def get_gspread_client():
     """
@@ -45,6 +51,11 @@ def get_gspread_client():
 
     if _gspread_client is None:
         try:
+            import gspread
+            from google.oauth2.service_account import Credentials
+            from requests.adapters import HTTPAdapter
+            from urllib3.util.retry import Retry
+
             # Get credentials from secrets
             credentials_dict = dict(st.secrets["connections"]["gsheets"])
 
@@ -65,6 +76,26 @@ def get_gspread_client():
 
             # Create gspread client
             _gspread_client = gspread.authorize(credentials)
+
+            # Google APIs only gzip responses for clients whose User-Agent contains "gzip"
+            session = _gspread_client.session
+            session.headers['User-Agent'] = f"{session.headers.get('User-Agent', 'python-requests')} (gzip)"
+
+            # Keep TLS connections alive between API calls and retry transient errors.
+            # Only reads (GET) are retried, so an append (POST) or header update (PUT) is
+            # never sent twice. raise_on_status=False returns the last error response once
+            # the retries are used up, so gspread still raises its usual APIError.
+            session.mount('https://', HTTPAdapter(
+                pool_connections=20,
+                pool_maxsize=20,
+                max_retries=Retry(
+                    total=3,
+                    backoff_factor=0.3,
+                    status_forcelist=[429, 500, 502, 503, 504],
+                    allowed_methods=frozenset({'GET'}),
+                    raise_on_status=False
+                )
+            ))
             print("[INFO] gspread client created successfully")
 
         except Exception as e:
@@ -76,10 +107,38 @@ def get_gspread_client():
     return _gspread_client
 
 
+def get_spreadsheet():
+    """
+    Get or open the cached spreadsheet handle for the URL in secrets.
+
+    open_by_url fetches the spreadsheet metadata, so it is called once per process
+    instead of once per read or write.
+
+    Returns:
+        gspread.Spreadsheet object or None if no client is available
+    """
+    global _spreadsheet_handle
+
+    if _spreadsheet_handle is None:
+        gspread_client = get_gspread_client()
+        if gspread_client is None:
+            print("[WARNING] No gspread client available")
+            return None
+
+        spreadsheet_url = st.secrets["connections"]["gsheets"]["spreadsheet"]
+        _spreadsheet_handle = gspread_client.open_by_url(spreadsheet_url)
+
+    return _spreadsheet_handle
+
+
 def append_rating_to_gsheets(rating_data, worksheet="v4_ImageText_ratings"):
     """
     Append a single rating row to Google Sheets using true append (no overwrite).
 
+    The row is written before this returns, so the result reports whether it is
+    stored in the sheet. Use queue_rating_for_gsheets for rows that are already
+    persisted elsewhere (e.g. the local ratings log).
+
     Parameters:
         rating_data: Dictionary with rating information
         worksheet: Name of worksheet to write to (default: "ratings")
@@ -87,237 +146,481 @@ def append_rating_to_gsheets(rating_data, worksheet="v4_ImageText_ratings"):
     Returns:
         True if successful, False otherwise
     """
-    try:
-        # Get the gspread client for advanced operations
-        gspread_client = get_gspread_client()
-        if gspread_client is None:
-            print("[WARNING] No gspread client available")
-            return False
+    success = _append_rows_to_gsheets([_timestamped_rating(rating_data)], worksheet)
+    if success:
+        _read_ratings_df.clear()
+    return success
 
-        # Add timestamp
-        rating_data_with_timestamp = rating_data.copy()
-        rating_data_with_timestamp['timestamp'] = datetime.now().isoformat()
 
-        # Get spreadsheet URL from secrets
-        spreadsheet_url = st.secrets["connections"]["gsheets"]["spreadsheet"]
+def _timestamped_rating(rating_data):
+    """
+    Copy a rating row with its timestamp and a rating_key (user_id|id|timestamp).
+
+    A 'timestamp' already in the row (set by save_rating when the rating was saved)
+    is kept, so the sheet and the local ratings log record the same time.
+    The key identifies the row in the sheet, so an append that is retried after an
+    uncertain failure can be checked for (and dropped if it was already written).
+    """
+    timestamp = rating_data.get('timestamp') or datetime.now().isoformat()
+    rating_key = f"{rating_data.get('user_id')}|{rating_data.get('id')}|{timestamp}"
+    return rating_data | {'timestamp': timestamp, 'rating_key': rating_key}
+
+
+def queue_rating_for_gsheets(rating_data, worksheet="v4_ImageText_ratings"):
+    """
+    Queue a rating row to be appended to Google Sheets in the background.
+
+    Only queue rows that are also stored elsewhere: queued rows live in process memory
+    until they are written and are lost if the process stops first.
+
+    Rows are timestamped when queued and written in one batch by a background thread,
+    once RATING_BATCH_SIZE rows are pending or no rating has been queued for
+    RATING_FLUSH_IDLE seconds.
+    The caller does not wait for the network round-trip.
+
+    Parameters:
+        rating_data: Dictionary with rating information
+        worksheet: Name of worksheet to write to (default: "ratings")
+
+    Returns:
+        True (the rating was queued)
+    """
+    global _rating_flush_thread, _rating_last_queued
+
+    row = _timestamped_rating(rating_data)
+
+    with _rating_queue_lock:
+        _rating_queue.append((worksheet, row))
+        _rating_last_queued = time.monotonic()
+        pending = len(_rating_queue)
+
+        if _rating_flush_thread is None:
+            _rating_flush_thread = threading.Thread(target=_rating_flush_loop, name="gsheets-rating-flush", daemon=True)
+            _rating_flush_thread.start()
+            atexit.register(flush_rating_queue)
+
+    if pending >= RATING_BATCH_SIZE:
+        _rating_flush_event.set()
+
+    return True
+
+
+def flush_rating_queue():
+    """
+    Append all queued ratings to Google Sheets (one request per worksheet and
+    RATING_MAX_ROWS_PER_REQUEST rows).
+
+    Rows that could not be written are put back at the front of the queue
+    and retried on the next flush.
+
+    Returns:
+        True if every queued row was written, False otherwise
+    """
+    with _rating_flush_lock:
+        return _flush_rating_queue()
+
+
+def _flush_rating_queue():
+    """Flush the rating queue (caller holds _rating_flush_lock)."""
+    with _rating_queue_lock:
+        pending = _rating_queue[:]
+        _rating_queue.clear()
+
+    if not pending:
+        return True
+
+    # Group by worksheet, keeping the submission order
+    rows_by_worksheet = {}
+    for worksheet, row in pending:
+        rows_by_worksheet.setdefault(worksheet, []).append(row)
+
+    failed = []
+    for worksheet, rows in rows_by_worksheet.items():
+        try:
+            rows = _drop_already_written(rows, worksheet)
+        except Exception as e:
+            print(f"[WARNING] Could not check for already written ratings: {e}")
+            failed.extend((worksheet, row) for row in rows)
+            continue
+
+        for start in range(0, len(rows), RATING_MAX_ROWS_PER_REQUEST):
+            chunk = rows[start:start + RATING_MAX_ROWS_PER_REQUEST]
+            if not _append_rows_to_gsheets(chunk, worksheet):
+                # The request may still have been applied, so check these rows before the retry
+                _rating_unconfirmed_keys.update(row['rating_key'] for row in chunk)
+                # Keep the order: this chunk and everything after it is retried later
+                failed.extend((worksheet, row) for row in rows[start:])
+                break
+            _rating_unconfirmed_keys.difference_update(row['rating_key'] for row in chunk)
+            _read_ratings_df.clear()
+            print(f"[INFO] Appended {len(chunk)} queued rating(s) to Google Sheets (worksheet: {worksheet})")
+
+    if failed:
+        print(f"[WARNING] {len(failed)} rating(s) could not be written to Google Sheets, will retry")
+        with _rating_queue_lock:
+            _rating_queue[:0] = failed
+
+    return not failed
+
+
+def _drop_already_written(rows, worksheet):
+    """
+    Remove rows whose earlier, failed append reached the sheet anyway.
+
+    Only rows listed in _rating_unconfirmed_keys are checked, so a normal flush
+    makes no extra request.
+
+    Returns:
+        The rows that still need to be appended, in their original order
+    """
+    if not any(row['rating_key'] in _rating_unconfirmed_keys for row in rows):
+        return rows
+
+    columns = _read_sheet_columns(worksheet, ['rating_key'])
+    written = set(columns[0]) if columns is not None else set()
+    _rating_unconfirmed_keys.difference_update(written)
+
+    remaining = [row for row in rows if row['rating_key'] not in written]
+    if len(remaining) < len(rows):
+        print(f"[INFO] Skipping {len(rows) - len(remaining)} rating(s) already written to Google Sheets")
+    return remaining
 
-        # Open the spreadsheet
-        spreadsheet = gspread_client.open_by_url(spreadsheet_url)
 
-        # Try to get the worksheet, create if it doesn't exist
+def _rating_flush_loop():
+    """
+    Background thread: flush the rating queue when a full batch is waiting or the queue went idle.
+
+    After a failed flush (e.g. the Sheets API rate limit, HTTP 429) the thread waits
+    RATING_RETRY_BACKOFF seconds, doubling per consecutive failure up to
+    RATING_RETRY_BACKOFF_MAX, before it writes again.
+    """
+    failures = 0
+    while True:
+        batch_full = _rating_flush_event.wait(RATING_FLUSH_IDLE)
+        _rating_flush_event.clear()
+
+        # A burst of ratings keeps resetting the idle window and is written as one batch
+        if not batch_full and time.monotonic() - _rating_last_queued < RATING_FLUSH_IDLE:
+            continue
         try:
-            ws = spreadsheet.worksheet(worksheet)
-        except Exception:
-            # Worksheet doesn't exist, create it
-            ws = spreadsheet.add_worksheet(title=worksheet, rows=1000, cols=26)
-            print(f"[INFO] Created new worksheet: {worksheet}")
-
-        # Check if this is the first row (header needed)
-        existing_data = ws.get_all_values()
-
-        if len(existing_data) == 0 or (len(existing_data) == 1 and not existing_data[0]):
-            # Sheet is empty, write header first
-            headers = list(rating_data_with_timestamp.keys())
-            values = list(rating_data_with_timestamp.values())
-
-            ws.append_row(headers, value_input_option='RAW')
-            ws.append_row(values, value_input_option='USER_ENTERED')
-            print(f"[INFO] Created headers and appended first rating to worksheet: {worksheet}")
+            success = flush_rating_queue()
+        except Exception as e:
+            print(f"[ERROR] Rating flush failed: {e}")
+            success = False
+
+        if success:
+            failures = 0
         else:
-            # Sheet has data, check if we need to add new columns
-            existing_headers = existing_data[0]
-            new_keys = set(rating_data_with_timestamp.keys())
-            existing_keys = set(existing_headers)
-
-            # If there are new columns, we need to update headers
-            if new_keys != existing_keys:
-                all_keys = existing_keys | new_keys
-                # Create ordered list of all columns
-                all_columns = existing_headers + [k for k in new_keys if k not in existing_keys]
-
-                # Update header row
-                ws.update('1:1', [all_columns], value_input_option='RAW')
-
-                # Prepare row with values in correct column order
-                row_values = [rating_data_with_timestamp.get(col, '') for col in all_columns]
-            else:
-                # Use existing column order
-                row_values = [rating_data_with_timestamp.get(col, '') for col in existing_headers]
-
-            # Append the new row
-            ws.append_row(row_values, value_input_option='USER_ENTERED')
-            print(f"[INFO] Rating appended to Google Sheets (worksheet: {worksheet})")
+            backoff = min(RATING_RETRY_BACKOFF * 2 ** failures, RATING_RETRY_BACKOFF_MAX)
+            failures += 1
+            print(f"[WARNING] Retrying rating flush in {backoff:.0f}s")
+            time.sleep(backoff)
+
+
+def _get_queued_rated_ids(user_id, worksheet):
+    """Return action IDs of queued (not yet written) ratings for a user (case-insensitive)."""
+    user_id_lower = user_id.lower()
+    with _rating_queue_lock:
+        return [row.get('id') for ws, row in _rating_queue
+                if ws == worksheet and str(row.get('user_id', '')).lower() == user_id_lower]
+
+
+def _append_rows_to_gsheets(rows, worksheet):
+    """
+    Append rows to a worksheet with a single values.append request, adding header columns as needed.
+
+    The header row is read once per worksheet (row_values(1)) and cached; it is only
+    written again when the rows contain keys that are not in the header yet.
+
+    Parameters:
+        rows: List of dictionaries (column name -> value)
+        worksheet: Name of worksheet to write to (created if it doesn't exist)
+
+    Returns:
+        True if successful, False otherwise
+    """
+    try:
+        spreadsheet = get_spreadsheet()
+        if spreadsheet is None:
+            return False
+
+        ws = None
+        headers = _header_cache.get(worksheet)
+        if headers is None:
+            ws = _get_or_create_worksheet(spreadsheet, worksheet)
+            headers = ws.row_values(1)
+
+        # Store a lower-cased copy of the user ID so lookups don't lower-case every row
+        for row in rows:
+            if 'user_id' in row:
+                row['user_id_lower'] = str(row['user_id']).lower()
+
+        # Add any keys not in the header yet (in first-seen order); with a stable schema
+        # every row passes the superset check and no diff is built
+        known_headers = _known_headers_set.get(worksheet)
+        if known_headers is None:
+            known_headers = frozenset(headers)
+        new_columns = []
+        if not all(known_headers.issuperset(row) for row in rows):
+            known_columns = set(known_headers)
+            for row in rows:
+                for key in row:
+                    if key not in known_columns:
+                        known_columns.add(key)
+                        new_columns.append(key)
+
+        if new_columns:
+            if ws is None:
+                ws = _get_or_create_worksheet(spreadsheet, worksheet)
+            headers = headers + new_columns
+            ws.update('A1', [headers], value_input_option='RAW')
+            print(f"[INFO] Updated headers in worksheet: {worksheet}")
+            known_headers = frozenset(headers)
+
+        _header_cache[worksheet] = headers
+        _known_headers_set[worksheet] = known_headers
+
+        # Append all rows in the header's column order with one request
+        values = [[row.get(col, '') for col in headers] for row in rows]
+        spreadsheet.values_append(
+            f"'{worksheet}'!A1",
+            {"valueInputOption": "USER_ENTERED", "insertDataOption": "INSERT_ROWS"},
+            {"values": values}
+        )
 
         return True
 
     except Exception as e:
-        print(f"[ERROR] Failed to append rating to Google Sheets: {e}")
+        # Re-read the header (and look the worksheet up again) on the next attempt in case it changed
+        _header_cache.pop(worksheet, None)
+        _known_headers_set.pop(worksheet, None)
+        _worksheet_cache.pop(worksheet, None)
+        print(f"[ERROR] Failed to append rows to Google Sheets: {e}")
         import traceback
         traceback.print_exc()
         return False
 
 
+def _get_or_create_worksheet(spreadsheet, worksheet):
+    """Return the (cached) worksheet with the given name, creating it if it doesn't exist."""
+    from gspread.exceptions import WorksheetNotFound
+
+    ws = _worksheet_cache.get(worksheet)
+    if ws is not None:
+        return ws
+
+    try:
+        ws = spreadsheet.worksheet(worksheet)
+    except WorksheetNotFound:
+        # Worksheet doesn't exist, create it
+        ws = spreadsheet.add_worksheet(title=worksheet, rows=1000, cols=26)
+        print(f"[INFO] Created new worksheet: {worksheet}")
+
+    _worksheet_cache[worksheet] = ws
+    return ws
+
+
 def read_ratings_from_gsheets(worksheet="v4_ImageText_ratings"):
     """
     Read all ratings from Google Sheets.
 
+    Successful reads are cached for 30 seconds and cleared whenever ratings are appended;
+    failed reads are not cached, so the next call tries again.
+
     Parameters:
         worksheet: Name of worksheet to read from (default: "ratings")
 
     Returns:
         DataFrame with all ratings, or empty DataFrame if failed
     """
-    try:
-        conn = get_gsheets_connection()
-        if conn is None:
-            return pd.DataFrame()
+    import pandas as pd
 
-        df = conn.read(worksheet=worksheet, ttl=0)
-        print(f"[INFO] Read {len(df)} ratings from Google Sheets")
-        return df
+    try:
+        return _read_ratings_df(worksheet)
 
     except Exception as e:
         print(f"[ERROR] Failed to read ratings from Google Sheets: {e}")
         return pd.DataFrame()
 
 
+@st.cache_data(ttl=30, show_spinner=False)
+def _read_ratings_df(worksheet):
+    """Cached read of the ratings worksheet (raises on failure, so errors are never cached)."""
+    df = _read_worksheet_df(worksheet)
+    print(f"[INFO] Read {len(df)} ratings from Google Sheets")
+    return df
+
+
+def _read_worksheet_df(worksheet):
+    """
+    Download a whole worksheet into a DataFrame (first row as header) with the gspread client.
+
+    Numbers are converted like the Sheets connection did; blank cells become missing values.
+
+    Parameters:
+        worksheet: Name of worksheet to read from
+
+    Returns:
+        DataFrame with one row per data row (empty if the worksheet has no data)
+
+    Raises:
+        RuntimeError if no gspread client is available; gspread errors are passed on
+    """
+    import pandas as pd
+
+    spreadsheet = get_spreadsheet()
+    if spreadsheet is None:
+        raise RuntimeError("No Google Sheets client available")
+
+    ws = _worksheet_cache.get(worksheet)
+    if ws is None:
+        ws = _worksheet_cache[worksheet] = spreadsheet.worksheet(worksheet)
+
+    return pd.DataFrame.from_records(ws.get_all_records(default_blank=None))
+
+
 def get_rated_videos_for_user_from_gsheets(user_id, worksheet="v4_ImageText_ratings"):
     """
     Get list of video IDs already rated by a specific user from Google Sheets (case-insensitive).
 
+    Only the 'user_id' and 'id' columns are downloaded, not the whole ratings sheet.
+
     Parameters:
         user_id: User identifier
         worksheet: Name of worksheet to read from (default: "ratings")
 
     Returns:
-        List of action IDs
+        Set of action IDs
+
+    Raises:
+        Exception if the ratings worksheet can't be read, so callers can tell
+        "nothing rated yet" apart from a failed lookup
     """
-    try:
-        df = read_ratings_from_gsheets(worksheet=worksheet)
+    user_id_lower = user_id.lower()
+    rated_ids = set()
 
-        if df.empty or 'user_id' not in df.columns or 'id' not in df.columns:
-            return []
+    # Compare against the stored user_id_lower column; only rows written before
+    # that column existed (empty cell) need their user_id lower-cased here
+    columns = _read_sheet_columns(worksheet, ['user_id_lower', 'user_id', 'id'])
+    if columns is None:
+        columns = _read_sheet_columns(worksheet, ['user_id', 'id'])
+        if columns is not None:
+            columns.insert(0, [])
 
-        # Filter by user_id (case-insensitive)
-        user_id_lower = user_id.lower()
-        df['user_id_lower'] = df['user_id'].astype(str).str.lower()
-        user_ratings = df[df['user_id_lower'] == user_id_lower]
+    if columns is not None:
+        lower_col, user_col, id_col = columns
+        rated_ids = {
+            vid for low, uid, vid in zip_longest(lower_col, user_col, id_col, fillvalue='')
+            if vid and (low or uid.lower()) == user_id_lower
+        }
 
-        # Get unique action IDs
-        rated_ids = user_ratings['id'].unique().tolist()
+    # Include ratings still waiting in the write queue
+    rated_ids.update(_get_queued_rated_ids(user_id, worksheet))
 
-        return rated_ids
-
-    except Exception as e:
-        print(f"[ERROR] Failed to get rated videos from Google Sheets: {e}")
-        return []
+    return rated_ids
 
 
-def append_user_to_gsheets(user_data, worksheet="v4_ImageText_users"):
+def _read_sheet_columns(worksheet, column_names):
     """
-    Append a single user row to Google Sheets using true append (no overwrite).
+    Download selected columns of a worksheet (data rows only) with one batchGet request.
+
+    Column positions come from the cached header row (read once per worksheet).
 
     Parameters:
-        user_data: Dictionary with user information
-        worksheet: Name of worksheet to write to (default: "users")
+        worksheet: Name of worksheet to read from
+        column_names: Header names of the columns to fetch
 
     Returns:
-        True if successful, False otherwise
+        List with one list of cell values (strings) per requested column,
+        or None if the worksheet or a column doesn't exist
+
+    Raises:
+        RuntimeError if no gspread client is available; gspread errors are passed on
     """
-    try:
-        # Get the gspread client for advanced operations
-        gspread_client = get_gspread_client()
-        if gspread_client is None:
-            print("[WARNING] No gspread client available")
-            return False
+    from gspread.exceptions import WorksheetNotFound
+    from gspread.utils import rowcol_to_a1
 
-        # Add timestamp
-        user_data_with_timestamp = user_data.copy()
-        user_data_with_timestamp['timestamp'] = datetime.now().isoformat()
+    spreadsheet = get_spreadsheet()
+    if spreadsheet is None:
+        raise RuntimeError("No Google Sheets client available")
 
-        # Get spreadsheet URL from secrets
-        spreadsheet_url = st.secrets["connections"]["gsheets"]["spreadsheet"]
+    headers = _header_cache.get(worksheet)
+    if headers is None:
+        ws = _worksheet_cache.get(worksheet)
+        try:
+            if ws is None:
+                ws = _worksheet_cache[worksheet] = spreadsheet.worksheet(worksheet)
+            headers = ws.row_values(1)
+        except WorksheetNotFound:
+            return None
+        _header_cache[worksheet] = headers
 
-        # Open the spreadsheet
-        spreadsheet = gspread_client.open_by_url(spreadsheet_url)
+    if not all(name in headers for name in column_names):
+        return None
 
-        # Try to get the worksheet, create if it doesn't exist
-        try:
-            ws = spreadsheet.worksheet(worksheet)
-        except Exception:
-            # Worksheet doesn't exist, create it
-            ws = spreadsheet.add_worksheet(title=worksheet, rows=1000, cols=26)
-            print(f"[INFO] Created new worksheet: {worksheet}")
-
-        # Check if this is the first row (header needed)
-        existing_data = ws.get_all_values()
-
-        if len(existing_data) == 0 or (len(existing_data) == 1 and not existing_data[0]):
-            # Sheet is empty, write header first
-            headers = list(user_data_with_timestamp.keys())
-            values = list(user_data_with_timestamp.values())
-
-            ws.append_row(headers, value_input_option='RAW')
-            ws.append_row(values, value_input_option='USER_ENTERED')
-            print(f"[INFO] Created headers and appended first user to worksheet: {worksheet}")
-        else:
-            # Sheet has data, check if we need to add new columns
-            existing_headers = existing_data[0]
-            new_keys = set(user_data_with_timestamp.keys())
-            existing_keys = set(existing_headers)
-
-            # If there are new columns, we need to update headers
-            if new_keys != existing_keys:
-                all_keys = existing_keys | new_keys
-                # Create ordered list of all columns
-                all_columns = existing_headers + [k for k in new_keys if k not in existing_keys]
-
-                # Update header row
-                ws.update('1:1', [all_columns], value_input_option='RAW')
-
-                # Prepare row with values in correct column order
-                row_values = [user_data_with_timestamp.get(col, '') for col in all_columns]
-            else:
-                # Use existing column order
-                row_values = [user_data_with_timestamp.get(col, '') for col in existing_headers]
-
-            # Append the new row
-            ws.append_row(row_values, value_input_option='USER_ENTERED')
-            print(f"[INFO] User data appended to Google Sheets (worksheet: {worksheet})")
+    ranges = []
+    for name in column_names:
+        first_cell = rowcol_to_a1(2, headers.index(name) + 1)  # e.g. 'B2'
+        ranges.append(f"'{worksheet}'!{first_cell}:{first_cell.rstrip('0123456789')}")
 
-        return True
+    response = spreadsheet.values_batch_get(ranges, params={'majorDimension': 'COLUMNS'})
+    return [
+        value_range['values'][0] if value_range.get('values') else []
+        for value_range in response.get('valueRanges', [])
+    ]
 
-    except Exception as e:
-        print(f"[ERROR] Failed to append user to Google Sheets: {e}")
-        import traceback
-        traceback.print_exc()
-        return False
+
+def append_user_to_gsheets(user_data, worksheet="v4_ImageText_users"):
+    """
+    Append a single user row to Google Sheets using true append (no overwrite).
+
+    Parameters:
+        user_data: Dictionary with user information
+        worksheet: Name of worksheet to write to (default: "users")
+
+    Returns:
+        True if successful, False otherwise
+    """
+    # Add timestamp (new dict, the caller's data is left unchanged)
+    success = _append_rows_to_gsheets([user_data | {'timestamp': datetime.now().isoformat()}], worksheet)
+    if success:
+        _read_users_df.clear()
+        _read_user_id_set.clear()
+        print(f"[INFO] User data appended to Google Sheets (worksheet: {worksheet})")
+    return success
 
 
 def read_users_from_gsheets(worksheet="v4_ImageText_users"):
     """
     Read all users from Google Sheets.
 
+    Successful reads are cached for 30 seconds and cleared whenever a user is appended;
+    failed reads are not cached, so the next call tries again.
+
     Parameters:
         worksheet: Name of worksheet to read from (default: "users")
 
     Returns:
         DataFrame with all users, or empty DataFrame if failed
     """
-    try:
-        conn = get_gsheets_connection()
-        if conn is None:
-            return pd.DataFrame()
+    import pandas as pd
 
-        df = conn.read(worksheet=worksheet, ttl=0)
-        print(f"[INFO] Read {len(df)} users from Google Sheets")
-        return df
+    try:
+        return _read_users_df(worksheet)
 
     except Exception as e:
         print(f"[ERROR] Failed to read users from Google Sheets: {e}")
         return pd.DataFrame()
 
 
+@st.cache_data(ttl=30, show_spinner=False)
+def _read_users_df(worksheet):
+    """Cached read of the users worksheet (raises on failure, so errors are never cached)."""
+    df = _read_worksheet_df(worksheet)
+    print(f"[INFO] Read {len(df)} users from Google Sheets")
+    return df
+
+
 def user_exists_in_gsheets(user_id, worksheet="v4_ImageText_users"):
     """
     Check if a user exists in Google Sheets (case-insensitive).
@@ -328,21 +631,35 @@ def user_exists_in_gsheets(user_id, worksheet="v4_ImageText_users"):
 
     Returns:
         True if user exists, False otherwise
+
+    Raises:
+        Exception if the users worksheet can't be read, so callers can tell
+        "not found" apart from a failed lookup
     """
-    try:
-        df = read_users_from_gsheets(worksheet=worksheet)
+    return user_id.casefold() in _read_user_id_set(worksheet)
 
-        if df.empty or 'user_id' not in df.columns:
-            return False
 
-        # Check if user_id exists (case-insensitive)
-        user_id_lower = user_id.lower()
-        df['user_id_lower'] = df['user_id'].astype(str).str.lower()
-        return user_id_lower in df['user_id_lower'].values
+@st.cache_resource(ttl=30, show_spinner=False)
+def _read_user_id_set(worksheet="v4_ImageText_users"):
+    """
+    Case-folded user IDs from the users worksheet, for O(1) existence checks.
 
-    except Exception as e:
-        print(f"[ERROR] Failed to check user existence in Google Sheets: {e}")
-        return False
+    Built once per read of the sheet and shared as-is (a frozenset, so not copied
+    on every call like st.cache_data results); cleared whenever a user is appended.
+    A failed read raises instead of returning an empty set, so it is not cached.
+
+    Parameters:
+        worksheet: Name of worksheet to read from (default: "users")
+
+    Returns:
+        frozenset of case-folded user IDs
+    """
+    df = _read_users_df(worksheet)
+
+    if df.empty or 'user_id' not in df.columns:
+        return frozenset()
+
+    return frozenset(df['user_id'].dropna().astype(str).str.casefold())
 
 
 def get_all_user_ids_from_gsheets(worksheet="v4_ImageText_users"):
@@ -0,0 +1,12 @@
+"""
+Field names stored with every rating.
+
+Kept free of third-party imports so the offline export (utils/export_to_csv.py)
+can use them without the web app's dependencies.
+"""
+
+# Device fields stored alongside each rating
+DEVICE_RATING_FIELDS = (
+    'device_type', 'os', 'browser', 'browser_version',
+    'maxTouchPoints', 'screen_width', 'screen_height', 'user_agent'
+)
@@ -1,7 +1,7 @@
 """
 User class for storing demographic and experience data.
 """
-import random
+import secrets
 import string
 
 class User:
@@ -24,35 +24,36 @@ class User:
     def generate_random_user_id(self, existing_user_ids=None):
         """
         Generate a random user ID: 4 uppercase letters + 2 digits (e.g., ABCD12).
-        Ensures the generated ID doesn't already exist in the system.
+        Ensures the generated ID doesn't already exist in the system (case-insensitive).
 
         Parameters:
-        - existing_user_ids: List of existing user IDs to avoid duplicates
+        - existing_user_ids: Collection of existing user IDs to avoid duplicates
 
         Returns:
         - Generated user ID string
         """
-        if existing_user_ids is None:
-            existing_user_ids = []
+        # Local user files are stored under lower-case names, so compare case-insensitively
+        existing_ids_lower = {str(uid).lower() for uid in existing_user_ids or ()}
 
         max_attempts = 1000  # Prevent infinite loop
         attempts = 0
 
         while attempts < max_attempts:
-            # Generate 4 random uppercase letters
-            letters = ''.join(random.choices(string.ascii_uppercase, k=4))
-            # Generate 2 random digits
-            digits = ''.join(random.choices(string.digits, k=2))
-            # Combine
-            new_id = letters + digits
+            attempts += 1  # Counted first so rejected draws count towards the cap too
+
+            # Draw all random bytes at once: 4 for the letters, 2 for the digits
+            raw = secrets.token_bytes(6)
+            number = int.from_bytes(raw[4:], 'big')
+            # Rejection sampling keeps every letter and digit pair equally likely
+            if max(raw[:4]) >= 234 or number >= 65500:  # 234 = 9 * 26, 65500 = 655 * 100
+                continue
+            new_id = ''.join(string.ascii_uppercase[b % 26] for b in raw[:4]) + f"{number % 100:02d}"
 
             # Check if ID already exists
-            if new_id not in existing_user_ids:
+            if new_id.lower() not in existing_ids_lower:
                 self.user_id = new_id
                 return new_id
 
-            attempts += 1
-
         # Fallback if somehow we can't generate a unique ID (very unlikely)
         raise Exception("Failed to generate unique user ID after 1000 attempts")
 
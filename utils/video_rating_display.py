@@ -4,6 +4,106 @@ Used by both main videoplayer and familiarization screens.
 """
 import streamlit as st
 import os
+import math
+import numpy as np
+from io import BytesIO
+
+
+# Pitch image resolution: 200 dpi, like st.pyplot's figure export (6 x 4 in -> 1200 x 800 px);
+# st.image scales it down to the column width, so it stays sharp on high-density screens
+PITCH_DPI = 200
+
+# Action arrow style on the pitch image (pixels at PITCH_DPI)
+PITCH_ARROW_COLOR = (0, 0, 255)
+PITCH_ARROW_WIDTH = 6
+PITCH_ARROW_HEAD = 30  # length and half-width of the arrow head
+PITCH_MARKER_RADIUS = 14
+
+
+@st.cache_resource(show_spinner=False)
+def _get_pitch_template():
+    """
+    Render the empty pitch once per process as a PIL image.
+
+    The pitch is identical for every action, so only the action arrow is drawn
+    per video (see _draw_pitch_action) on a copy of this image.
+
+    Returns:
+    - Tuple (image, transform): the RGB pitch image and (scale_x, offset_x, scale_y, offset_y)
+      mapping pitch coordinates to image pixels (x_px = scale_x * x + offset_x, same for y)
+    """
+    # Lazy imports to avoid binary conflicts on Streamlit Cloud
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    import mplsoccer
+    from PIL import Image
+
+    pitch = mplsoccer.Pitch(pitch_type="statsbomb", pitch_color="grass")
+    fig, ax = pitch.draw(figsize=(6, 4))
+    fig.set_dpi(PITCH_DPI)
+
+    fig.patch.set_facecolor('black')
+    fig.patch.set_alpha(1)
+
+    fig.tight_layout(pad=0)
+    fig.subplots_adjust(left=0, right=1, top=1, bottom=0)
+
+    fig.canvas.draw()
+    image = Image.fromarray(np.asarray(fig.canvas.buffer_rgba())).convert('RGB')
+
+    # The pitch axes are linear, so data -> display is affine; display y counts from the bottom
+    (x0, y0), (x1, y1) = ax.transData.transform([(0, 0), (1, 1)])
+    transform = (x1 - x0, x0, y0 - y1, image.height - y0)
+
+    plt.close(fig)
+    return image, transform
+
+
+def _draw_pitch_action(start_x, start_y, end_x, end_y):
+    """
+    Draw an action arrow on a copy of the cached pitch image.
+
+    Returns:
+    - PIL image of the pitch with the arrow and start marker
+    """
+    from PIL import ImageDraw
+
+    template, (scale_x, offset_x, scale_y, offset_y) = _get_pitch_template()
+    sx, sy = scale_x * start_x + offset_x, scale_y * start_y + offset_y
+    ex, ey = scale_x * end_x + offset_x, scale_y * end_y + offset_y
+
+    image = template.copy()
+    draw = ImageDraw.Draw(image)
+
+    # Shaft up to the base of the head, then the head as a triangle
+    length = math.hypot(ex - sx, ey - sy)
+    if length > 0:
+        ux, uy = (ex - sx) / length, (ey - sy) / length
+        head = min(PITCH_ARROW_HEAD, length)
+        bx, by = ex - ux * head, ey - uy * head
+        draw.line([(sx, sy), (bx, by)], fill=PITCH_ARROW_COLOR, width=PITCH_ARROW_WIDTH)
+        draw.polygon([(ex, ey),
+                      (bx - uy * PITCH_ARROW_HEAD, by + ux * PITCH_ARROW_HEAD),
+                      (bx + uy * PITCH_ARROW_HEAD, by - ux * PITCH_ARROW_HEAD)],
+                     fill=PITCH_ARROW_COLOR)
+
+    r = PITCH_MARKER_RADIUS
+    draw.ellipse([(sx - r, sy - r), (sx + r, sy + r)], fill=PITCH_ARROW_COLOR)
+    return image
+
+
+@st.cache_data(max_entries=512, show_spinner=False)
+def _render_pitch_png(start_x, start_y, end_x, end_y):
+    """
+    Render the pitch with an action arrow as PNG bytes.
+
+    The image only depends on the four coordinates, so it is cached on them:
+    reruns (e.g. every slider move) reuse the PNG instead of drawing again.
+    """
+    buffer = BytesIO()
+    _draw_pitch_action(start_x, start_y, end_x, end_y).save(buffer, format='png')
+    return buffer.getvalue()
 
 
 def display_video_only(video_filename, video_path, config, display_video_func, action_id=None, metadata=None):
@@ -16,16 +116,16 @@ def display_video_only(video_filename, video_path, config, display_video_func, a
     - config: Configuration dictionary
     - display_video_func: Function to display video (should accept file_path and playback_mode)
     - action_id: Optional action ID for metadata lookup
-    - metadata: Optional metadata DataFrame
+    - metadata: Optional dict of metadata rows keyed by action ID ({id: {column: value}})
     """
     video_playback_mode = config['settings'].get('video_playback_mode', 'once')
     video_width = config['settings'].get('video_width', 800)
     display_metadata = config['settings'].get('display_metadata', True)
 
     # Top metadata bar (if enabled and metadata available)
-    if display_metadata and metadata is not None and not metadata.empty and action_id:
-        row = metadata[metadata['id'] == action_id]
-        if not row.empty:
+    if display_metadata and metadata and action_id:
+        row = metadata.get(action_id)
+        if row is not None:
             # Get metadata fields to display from config
             metadata_to_show = config['settings'].get('metadata_to_show', [])
 
@@ -39,9 +139,9 @@ def display_video_only(video_filename, video_path, config, display_video_func, a
                     column = field_config.get('column', '')
 
                     # Check if column exists in metadata
-                    if column and column in row.columns:
+                    if column and column in row:
                         with cols[idx]:
-                            st.metric(label, row[column].values[0])
+                            st.metric(label, row[column])
 
     # Display centered video (no spacing/divider)
     video_file = os.path.join(video_path, video_filename)
@@ -196,6 +296,49 @@ def display_rating_scales_only(video_filename, rating_scales, key_prefix, action
     return scale_values
 
 
+@st.fragment
+def _display_rating_scales_fragment(video_filename, rating_scales, key_prefix, action_id=None):
+    """
+    Display the rating scales as a fragment.
+
+    Interacting with a scale only reruns this fragment instead of the whole page,
+    so the video shown next to the scales is not rebuilt and re-sent to the browser.
+    On full reruns (e.g. after a button click) the current scale values are returned.
+    """
+    return display_rating_scales_only(video_filename, rating_scales, key_prefix, action_id)
+
+
+def get_scale_values_from_state(video_filename, rating_scales, key_prefix, action_id=None):
+    """
+    Read the current rating scale values from session state.
+
+    Meant for button callbacks, which run before the script and therefore
+    before display_rating_scales_only() has returned the values.
+
+    Parameters:
+    - video_filename: Name of the video file (for unique keys)
+    - rating_scales: List of rating scale configurations
+    - key_prefix: Prefix for Streamlit widget keys
+    - action_id: Optional action ID (used for the keys instead of the filename)
+
+    Returns:
+    - scale_values: Dictionary of {scale_title: selected_value}
+    """
+    scale_values = {}
+
+    for scale_config in rating_scales:
+        title = scale_config.get('title', 'Scale')
+        unique_key = f"{key_prefix}{video_filename}_{title}" if not action_id else f"{key_prefix}{action_id}_{title}"
+        selected = st.session_state.get(unique_key)
+
+        if scale_config.get('type', 'discrete') == 'text':
+            selected = selected if selected else None
+
+        scale_values[title] = selected
+
+    return scale_values
+
+
 def display_video_rating_interface(
     video_filename,
     video_path,
@@ -218,7 +361,7 @@ def display_video_rating_interface(
     - rating_scales: List of rating scale configurations
     - key_prefix: Prefix for Streamlit widget keys (e.g., 'scale_' or 'famil_scale_')
     - action_id: Optional action ID for metadata lookup (used in main videoplayer)
-    - metadata: Optional metadata DataFrame
+    - metadata: Optional dict of metadata rows keyed by action ID ({id: {column: value}})
     - header_content: Optional content to display at the top (e.g., familiarization header)
     - display_video_func: Function to display video (should accept file_path and playback_mode)
     - display_mode: 'combined' for side-by-side, 'video_only' for video screen, 'rating_only' for rating screen
@@ -246,9 +389,9 @@ def display_video_rating_interface(
     video_playback_mode = config['settings'].get('video_playback_mode', 'loop')
 
     # Top metadata bar (if enabled and metadata available)
-    if display_metadata and metadata is not None and not metadata.empty and action_id:
-        row = metadata[metadata['id'] == action_id]
-        if not row.empty:
+    if display_metadata and metadata and action_id:
+        row = metadata.get(action_id)
+        if row is not None:
             # Get metadata fields to display from config
             metadata_to_show = config['settings'].get('metadata_to_show', [])
 
@@ -262,14 +405,14 @@ def display_video_rating_interface(
                     column = field_config.get('column', '')
 
                     # Check if column exists in metadata
-                    if column and column in row.columns:
+                    if column and column in row:
                         with cols[idx]:
-                            st.metric(label, row[column].values[0])
+                            st.metric(label, row[column])
 
         st.markdown("---")
 
     # Video and pitch visualization area
-    if display_pitch and metadata is not None and not metadata.empty and action_id:
+    if display_pitch and metadata and action_id:
         # Show video and pitch side by side
         col_video, col_pitch = st.columns([55, 45])
 
@@ -282,36 +425,19 @@ def display_video_rating_interface(
 
         with col_pitch:
             # Generate pitch visualization
-            row = metadata[metadata['id'] == action_id]
-            if not row.empty:
+            row = metadata.get(action_id)
+            if row is not None:
                 try:
-                    # Lazy imports to avoid binary conflicts on Streamlit Cloud
-                    import matplotlib
-                    matplotlib.use('Agg')
-                    import matplotlib.pyplot as plt
-                    import mplsoccer
-
-                    pitch = mplsoccer.Pitch(pitch_type="statsbomb", pitch_color="grass")
-                    fig, ax = pitch.draw(figsize=(6, 4))
-
-                    fig.patch.set_facecolor('black')
-                    fig.patch.set_alpha(1)
-
                     # Draw arrow
-                    start_x = row.start_x.values[0]
-                    start_y = row.start_y.values[0]
-                    end_x = row.end_x.values[0]
-                    end_y = row.end_y.values[0]
-
-                    pitch.arrows(start_x, start_y, end_x, end_y,
-                                ax=ax, color="blue", width=2, headwidth=10, headlength=5)
-                    ax.plot(start_x, start_y, 'o', color='blue', markersize=10)
-
-                    fig.tight_layout(pad=0)
-                    fig.subplots_adjust(left=0, right=1, top=1, bottom=0)
-
-                    st.pyplot(fig)
-                    plt.close(fig)
+                    start_x = row['start_x']
+                    start_y = row['start_y']
+                    end_x = row['end_x']
+                    end_y = row['end_y']
+
+                    st.image(
+                        _render_pitch_png(float(start_x), float(start_y), float(end_x), float(end_y)),
+                        use_container_width=True
+                    )
                 except ImportError:
                     st.warning("⚠️ Pitch visualization requires mplsoccer package. Please install it to enable this feature.")
                 except Exception as e:
@@ -331,137 +457,8 @@ def display_video_rating_interface(
                 st.video(video_file, autoplay=True, loop=(video_playback_mode == 'loop'))
 
         with col_rating_scales:
-            # Display rating scales
-            scale_values = {}
-
-            for scale_config in rating_scales:
-                scale_type = scale_config.get('type', 'discrete')
-                title = scale_config.get('title', 'Scale')
-                label_low = scale_config.get('label_low', '')
-                label_high = scale_config.get('label_high', '')
-                required = scale_config.get('required_to_proceed', True)
-
-                # Check if both labels are empty (saves vertical space)
-                labels_empty = not label_low and not label_high
-
-                if labels_empty:
-                    # Side-by-side layout: title on left, scale on right
-                    col_title, col_scale = st.columns([1, 3])
-
-                    with col_title:
-                        st.markdown(f"**{title}** {'*(required)*' if required else ''}")
-
-                    with col_scale:
-                        # Generate unique key for this scale
-                        unique_key = f"{key_prefix}{video_filename}_{title}" if not action_id else f"{key_prefix}{action_id}_{title}"
-
-                        if scale_type == 'discrete':
-                            values = scale_config.get('values', [1, 2, 3, 4, 5, 6, 7])
-                            selected = st.pills(
-                                label=title,
-                                options=values,
-                                key=unique_key,
-                                label_visibility="collapsed",
-                                selection_mode="single",
-                                width='stretch'
-                            )
-                            scale_values[title] = selected
-
-                        elif scale_type == 'slider':
-                            slider_min = scale_config.get('slider_min', 0)
-                            slider_max = scale_config.get('slider_max', 100)
-                            initial_state = scale_config.get('initial_state', 'low')
-
-                            # Calculate initial value based on initial_state
-                            if initial_state == 'low':
-                                initial_value = float(slider_min)
-                            elif initial_state == 'high':
-                                initial_value = float(slider_max)
-                            else:  # 'center' or any other value defaults to center
-                                initial_value = float(slider_min + slider_max) / 2
-
-                            selected = st.slider(
-                                label=title,
-                                min_value=float(slider_min),
-                                max_value=float(slider_max),
-                                value=initial_value,
-                                key=unique_key,
-                                label_visibility="collapsed"
-                            )
-                            scale_values[title] = selected
-
-                        elif scale_type == 'text':
-                            selected = st.text_input(
-                                label=title,
-                                key=unique_key,
-                                placeholder="Enter your response...",
-                                label_visibility="collapsed"
-                            )
-                            scale_values[title] = selected if selected else None
-
-                else:
-                    # Stacked layout with labels: title on top, labels on sides of scale
-                    st.markdown(f"**{title}** {'*(required)*' if required else ''}")
-
-                    col_low, col_scale, col_high = st.columns([1, 3, 1])
-
-                    with col_low:
-                        st.markdown(f"*{label_low}*")
-
-                    with col_scale:
-                        # Generate unique key for this scale
-                        unique_key = f"{key_prefix}{video_filename}_{title}" if not action_id else f"{key_prefix}{action_id}_{title}"
-
-                        if scale_type == 'discrete':
-                            values = scale_config.get('values', [1, 2, 3, 4, 5, 6, 7])
-                            selected = st.pills(
-                                label=title,
-                                options=values,
-                                key=unique_key,
-                                label_visibility="collapsed",
-                                selection_mode="single",
-                                width='stretch'
-                            )
-                            scale_values[title] = selected
-
-                        elif scale_type == 'slider':
-                            slider_min = scale_config.get('slider_min', 0)
-                            slider_max = scale_config.get('slider_max', 100)
-                            initial_state = scale_config.get('initial_state', 'low')
-
-                            # Calculate initial value based on initial_state
-                            if initial_state == 'low':
-                                initial_value = float(slider_min)
-                            elif initial_state == 'high':
-                                initial_value = float(slider_max)
-                            else:  # 'center' or any other value defaults to center
-                                initial_value = float(slider_min + slider_max) / 2
-
-                            selected = st.slider(
-                                label=title,
-                                min_value=float(slider_min),
-                                max_value=float(slider_max),
-                                value=initial_value,
-                                key=unique_key,
-                                label_visibility="collapsed"
-                            )
-                            scale_values[title] = selected
-
-                        elif scale_type == 'text':
-                            selected = st.text_input(
-                                label=title,
-                                key=unique_key,
-                                placeholder="Enter your response...",
-                                label_visibility="collapsed"
-                            )
-                            scale_values[title] = selected if selected else None
-
-                    with col_high:
-                        st.markdown(f"*{label_high}*")
-
-                st.markdown("")  # Spacing
-
-            return scale_values
+            # Display rating scales (as a fragment, so scale interactions don't re-render the video)
+            return _display_rating_scales_fragment(video_filename, rating_scales, key_prefix, action_id)
 
     # This shouldn't be reached but return empty dict as fallback
     return {}